@@ -3,19 +3,34 @@
 # **********************************************************************
 # * Description   : topology discovery for AS4538, a.k.a. China 
 #                           Education and Research Network Center
-# * Last change   : 16:50:54 2020-12-24
+# * Last change   : 08:25:11 2026-10-18
 # * Author        : Yihao Chen
 # * Email         : chenyiha17@mails.tsinghua.edu.cn
 # * License       : www.opensource.org/licenses/bsd-license.php
 # **********************************************************************
 
+import os
 import subprocess
 import json
 import pickle
-import pandas as pd
+import numpy as np
 import ipaddress as ipa
 from pathlib import Path
-from topology_discovery import *
+from topology_discovery import query_node_info, save_node_info_table, draw_prefixes, drawG, draw_scatter
+from doubletree import DoubleTree
+from probe_scheduler import probe_controls
+from trace_stream import stream_gateways
+from rediscovery import refresh_diff
+from trace_store import get_trace_store
+from graph_build import graph_from_traces
+from graph_analytics import rank_nodes
+from embedding import update_emb, save_emb_cache
+from ip_array import ip_to_uint32, uint32_to_ip
+from registry import RegistryCache
+from prefix_index import PrefixIndex
+from prefix_plan import plan_prefixes, report_plan, save_plan
+from subnet_expand import expand_subnets, expanded_node_count, expanded_edge_count, expanded_degree_map
+import metrics
 from tqdm import tqdm
 from glob import glob
 
@@ -39,72 +54,102 @@ def get_prefixes(): # NOTE: IPv6 included as well
     print(f"{len(prefixes)} in total")
     return prefixes
 
-def trace_prefixes(prefixes):
+def plan_targets(prefixes): # each /24 gateway once, under its most specific announced prefix
+    print("planning targets...")
+    plan = plan_prefixes(prefixes)
+    report_plan(plan)
+    save_plan(plan, output_dir / "plan.json")
+    return plan
+
+def trace_prefixes(prefixes, doubletree=False, adaptive=False):
+    plan = plan_targets(prefixes)
     print("tracing prefixes...")
-    def trace_prefix(p):
-        trace_path = output_dir / f"trace_{p.replace('/', '-')}"
-        if not trace_path.exists():
-            json.dump(trace_gateway(p), open(trace_path, "w"))
-    for prefix in tqdm(prefixes): trace_prefix(prefix)
+    kwargs = probe_controls() if adaptive else {}
+    if doubletree:
+        dt = DoubleTree()
+        kwargs["tracer"] = dt.trace
+    pbar = tqdm(unit="trace")
+    stream_gateways(list(plan.targets), output_dir, targets=plan.targets, on_trace=lambda *_: pbar.update(), **kwargs)
+    pbar.close()
+    if doubletree: print(f"doubletree: {dt.n_process} traceroute processes, {dt.n_probe} hops probed for {dt.n_hop} hops, {dt.n_saved} saved")
+
+def refresh_prefixes(prefixes, ttl=7*24*3600, **kwargs):
+    plan = plan_targets(prefixes)
+    print("refreshing prefixes...")
+    stats, diff = refresh_diff(list(plan.targets), output_dir, ttl, targets=plan.targets, **kwargs)
+    print(f"{stats['unchanged']} routes unchanged, {stats['changed']} changed, {stats['new']} new")
+    return diff
 
 def load_all_traces():
     print("loading traces...")
-    peer_map = {}
-    for f in tqdm(glob(str(output_dir / "trace_*"))):
-        get_peer_map(json.load(open(f, "r")), peer_map=peer_map)
-    return peer_map
+    store = get_trace_store(glob(str(output_dir / "trace_*")), output_dir / "store")
+    print(f"{len(store.targets)} traces, {len(store.hops)} hops")
+    return store
 
-def get_emb(G):
+def get_emb(nodes): # nodes: dotted-quad strings
     emb_path = output_dir / "emb"
-    if emb_path.exists():
-        print("loading emb...")
+    cache_path = output_dir / "emb_cache.npz"
+    if emb_path.exists() and not cache_path.exists(): # seed the cache with the old pickled embedding
         emb = pickle.load(open(emb_path, "rb"))
-    else:
-        print("training emb...")
-        emb = cluster(G)
-        pickle.dump(emb, open(emb_path, "wb"))
-    return emb
+        nodes, coords = ip_to_uint32(list(emb)), np.array(list(emb.values()), dtype=np.float32)
+        order = np.argsort(nodes)
+        save_emb_cache(cache_path, nodes[order], coords[order])
+    return update_emb(nodes, cache_path)
 
-def get_node_info(G):
+def get_node_info(graph, prefixes):
     node_info_path = output_dir / "node_info.csv"
-    if node_info_path.exists():
-        print("loading node info...")
-        df_node_info = pd.read_csv(node_info_path)
-    else:
-        print("querying node info...")
-        df_node_info = query_node_info(G)
-        df_node_info.to_csv(node_info_path, index=False)
+    print("ranking nodes...")
+    ranking = rank_nodes(graph)
+    print(f"{ranking['component'].nunique()} components, max core {ranking['core'].max()}")
+    print("querying node info...")
+    registry = RegistryCache(output_dir / "registry.json")
+    df_node_info = query_node_info(None, registry=registry, ranking=ranking)
+    df_node_info["prefix"] = PrefixIndex(prefixes).label(ip_to_uint32(df_node_info["node"]))
+    print(f"{df_node_info['prefix'].notna().sum()} nodes inside announced prefixes")
+    df_node_info.to_csv(node_info_path, index=False)
     return df_node_info
 
 
 if __name__ == "__main__":
-    prefixes = list(filter(lambda x: ipa.ip_network(x).version == 4, get_prefixes()))
-    trace_prefixes(prefixes)
-
-    peer_map = load_all_traces()
-    # G = expand_subnet(get_network_graph(peer_map))
-    G = get_network_graph(peer_map)
-    emb = get_emb(G)
-    df_node_info = get_node_info(G)
-    save_node_info_table(df_node_info)
-
-
-    # ==============================================
-    fig = plt.figure(figsize=(8, 8))
-
-    ax = fig.add_subplot(211)
-    ax.set_title("Prefix distribution of AS4538")
-    ax.grid(True)
-    draw_prefixes(ax, prefixes)
-
-    ax = fig.add_subplot(223)
-    ax.set_title("Topology of AS4538")
-    drawG(ax, G)
-
-    ax = fig.add_subplot(224)
-    ax.set_title("IP address map of AS4538")
-    draw_scatter(ax, G, emb)
-
-    fig.tight_layout()
-    fig.savefig("AS4538.pdf", bbox_inches="tight")
-    fig.savefig("AS4538.png", bbox_inches="tight")
+    reporter = metrics.Reporter(output_dir / "metrics.json", output_dir / "metrics.prom", interval=30, prefix="as4538")
+    try:
+        prefixes = list(filter(lambda x: ipa.ip_network(x).version == 4, get_prefixes()))
+        refresh = os.environ.get("TD_REFRESH") # hours, re-probe traces older than that instead of tracing anew
+        with metrics.stage("trace"):
+            if refresh: refresh_prefixes(prefixes, ttl=float(refresh) * 3600)
+            else: trace_prefixes(prefixes)
+
+        with metrics.stage("load_traces"): store = load_all_traces()
+        with metrics.stage("graph_build"):
+            graph = graph_from_traces(store)
+            ex = expand_subnets(graph) # hosts behind each x.x.x.1 gateway, kept virtual
+        print(f"{expanded_node_count(graph, ex)} nodes, {expanded_edge_count(graph, ex)} edges with subnets expanded")
+        with metrics.stage("embedding"): emb = get_emb(uint32_to_ip(graph.nodes))
+        with metrics.stage("node_info"):
+            df_node_info = get_node_info(graph, prefixes)
+            save_node_info_table(df_node_info)
+
+
+        # ==============================================
+        with metrics.stage("render"):
+            import matplotlib.pyplot as plt
+            fig = plt.figure(figsize=(8, 8))
+
+            ax = fig.add_subplot(211)
+            ax.set_title("Prefix distribution of AS4538")
+            ax.grid(True)
+            draw_prefixes(ax, prefixes)
+
+            ax = fig.add_subplot(223)
+            ax.set_title("Topology of AS4538")
+            drawG(ax, graph, degree=expanded_degree_map(graph, ex), pos=emb) # spring layout does not scale
+
+            ax = fig.add_subplot(224)
+            ax.set_title("IP address map of AS4538")
+            draw_scatter(ax, graph, emb)
+
+            fig.tight_layout()
+            fig.savefig("AS4538.pdf", bbox_inches="tight")
+            fig.savefig("AS4538.png", bbox_inches="tight")
+    finally: # the final metrics of a failed run as well
+        reporter.stop()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : stand-in for the ip.bczs.net registry pages
+# * Last change   : 08:03:58 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import random
+import threading
+import ipaddress as ipa
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import click
+
+def page(ip_addr): # every /16 is one allocated block
+    net = ipa.IPv4Network(f"{ip_addr}/16", strict=False)
+    a, b = str(ip_addr).split(".")[:2]
+    return (f"<html><body>{net[0]} - {net[-1]}<br>"
+            f"IP段名称：NET-{a}-{b}<br>IP段描述：block {a}.{b} of the synthetic as<br/></body></html>")
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, as the real site
+    error_rate, empty_rate = 0.0, 0.0
+    n_request = 0
+
+    def do_GET(self):
+        type(self).n_request += 1
+        try: ip_addr = ipa.IPv4Address(self.path.strip("/"))
+        except ValueError: return self.reply(404, "<html>not found</html>")
+        r = random.random()
+        if r < self.error_rate: return self.reply(random.choice([429, 503]), "<html>busy</html>")
+        if r < self.error_rate + self.empty_rate: return self.reply(200, "<html>查询失败</html>") # error page served as 200
+        self.reply(200, page(ip_addr))
+
+    def reply(self, status, text):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve(port=0, error_rate=0.0, empty_rate=0.0): # server running in a thread, base url is f"http://127.0.0.1:{server.server_port}"
+    handler = type("Handler", (Handler,), {"error_rate": error_rate, "empty_rate": empty_rate, "n_request": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@click.command()
+@click.option("--port", "-p", type=int, default=8000, help="port to listen on")
+@click.option("--error-rate", type=float, default=0.0, help="share of requests answered 429 / 503")
+@click.option("--empty-rate", type=float, default=0.0, help="share of requests answered 200 without registry info")
+def main(port, error_rate, empty_rate):
+    server = serve(port, error_rate, empty_rate)
+    print(f"serving on http://127.0.0.1:{server.server_port}")
+    threading.Event().wait()
+
+if __name__ == "__main__":
+    main()
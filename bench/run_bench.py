@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : offline benchmark of discovery & scan stages
+# * Last change   : 08:24:46 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import tracemalloc
+import ipaddress as ipa
+from glob import glob
+from pathlib import Path
+
+import click
+
+bench_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(bench_dir.parent))
+os.environ["PATH"] = f"{bench_dir / 'bin'}{os.pathsep}{os.environ['PATH']}"
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from synthetic_as import make_as
+
+def measure(stage, n, fn, report):
+    tracemalloc.start()
+    t = time.perf_counter()
+    ret = fn()
+    elapsed = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report.append({"stage": stage, "n": n, "seconds": elapsed, "per_sec": n / elapsed if elapsed else None, "peak_mb": peak / 2**20})
+    print(f"{stage:>16s} {n:>9d} {elapsed:>9.3f}s {n/max(elapsed, 1e-9):>12.1f}/s {peak/2**20:>9.1f}MB")
+    return ret
+
+def bench_scale(n_target, work_dir, n_concurrency, skip, latency=0.0005, loss=0.0):
+    import numpy as np
+    from probe_scheduler import gateway_targets
+    from trace_stream import stream_gateways
+    from trace_store import get_trace_store
+    from topology_discovery import get_peer_map
+    from graph_build import graph_from_traces, to_networkx, csr_edges
+    from ip_scan import masscan_stream, nmap_batch, nmap
+
+    report = []
+    cfg = make_as(n_target, latency=latency, loss=loss)
+    cfg_path = work_dir / "as.json"
+    json.dump(cfg, open(cfg_path, "w"))
+    os.environ["FAKE_AS"] = str(cfg_path)
+    prefixes = cfg["prefixes"]
+    print(f"--- {n_target} /24 targets, {len(prefixes)} prefixes, {latency*1000:g}ms per hop, {loss:.0%} loss ---")
+
+    trace_dir = work_dir / "traces"
+    trace_dir.mkdir()
+    n = sum(len(gateway_targets(p)) for p in prefixes)
+    measure("traceroute", n, lambda: stream_gateways(prefixes, trace_dir, n_concurrency=n_concurrency), report)
+    def yarrp():
+        from yarrp import YarrpProber, SimulatedTransport
+        from synthetic_as import load_as, hop_path
+        as_ = load_as(cfg_path)
+        prober = YarrpProber(SimulatedTransport(lambda t: hop_path(as_, t), latency=as_["latency"], loss=as_["loss"]), rate=10**6, timeout=0.1)
+        return prober.trace([t for p in prefixes for t in gateway_targets(p)])
+    measure("yarrp (sim)", n, yarrp, report)
+    files = glob(str(trace_dir / "trace_*"))
+    store = measure("trace store", n, lambda: get_trace_store(files, work_dir / "store"), report)
+    measure("peer map", len(store.hops), lambda: get_peer_map(store), report)
+    graph = measure("csr graph", len(store.hops), lambda: graph_from_traces(store), report)
+    G = measure("networkx", len(graph.indices), lambda: to_networkx(graph), report)
+
+    n = sum(ipa.IPv4Network(p).num_addresses for p in prefixes)
+    hosts = measure("masscan parse", n, lambda: [ip for p in prefixes for ip in masscan_stream(p, rate=10**7)], report)
+    sample = hosts[:256]
+    measure("nmap batch", len(sample), lambda: list(nmap_batch(sample)), report)
+    measure("nmap per ip", len(sample[:32]), lambda: [nmap(ip) for ip in sample[:32]], report)
+
+    if "tsne" not in skip:
+        from embedding import update_emb
+        emb = measure("tsne", G.number_of_nodes(), lambda: update_emb(list(G.nodes), work_dir / "emb.npz"), report)
+    else:
+        emb = {i: np.random.rand(2) for i in G.nodes}
+    if "render" not in skip:
+        import matplotlib.pyplot as plt
+        from topology_discovery import draw_scatter
+        def render():
+            fig, ax = plt.subplots()
+            draw_scatter(ax, G, emb)
+            fig.savefig(work_dir / "scatter.png")
+            plt.close(fig)
+        measure("render", len(csr_edges(graph)), render, report)
+    return report
+
+@click.command()
+@click.option("--scale", "-s", multiple=True, type=int, default=[64, 256, 1024], help="number of /24 targets of the synthetic as")
+@click.option("--n-concurrency", "-c", type=int, default=64, help="max number of traceroute running at once")
+@click.option("--latency", type=float, default=0.0005, help="seconds of latency per hop of the synthetic as")
+@click.option("--loss", type=float, default=0.0, help="share of probes lost by the stand-in tools")
+@click.option("--skip", multiple=True, type=click.Choice(["tsne", "render"]), help="stages to skip")
+@click.option("--output", "-o", type=Path, default=None, help="file path to save the json report")
+def main(scale, n_concurrency, latency, loss, skip, output):
+    report = {}
+    for n_target in scale:
+        with tempfile.TemporaryDirectory() as work_dir:
+            report[n_target] = bench_scale(n_target, Path(work_dir), n_concurrency, skip, latency=latency, loss=loss)
+    print(f"max rss: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10:.1f}MB")
+    if output: json.dump(report, open(output, "w"), indent=2)
+
+if __name__ == "__main__":
+    main()
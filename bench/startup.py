@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : startup time & memory of cli entry points and modules
+# * Last change   : 07:40:12 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import os
+import sys
+import json
+import time
+import subprocess
+from pathlib import Path
+from statistics import median
+
+import click
+
+repo_dir = Path(__file__).resolve().parent.parent
+heavy = ["numpy", "scipy", "pandas", "matplotlib", "seaborn", "networkx", "sklearn"]
+
+targets = { # NOTE: AS4538 & tsinghua are left out, importing them creates output dirs
+    "traces.py --help": ["traces.py", "--help"],
+    "shard.py --help": ["shard.py", "--help"],
+    "probe_scheduler": ["-c", "import probe_scheduler"],
+    "trace_stream": ["-c", "import trace_stream"],
+    "ip_scan": ["-c", "import ip_scan"],
+    "registry": ["-c", "import registry"],
+    "topology_discovery": ["-c", "import topology_discovery"],
+    "graph_build": ["-c", "import graph_build"],
+    "render": ["-c", "import render"],
+}
+
+def run_once(args):
+    """
+    one fresh interpreter, returns (wall seconds, max rss MB, top level
+    modules imported) from -X importtime and the rusage of that child only
+    """
+    t = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-X", "importtime"] + args, cwd=repo_dir,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read().decode()
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    assert proc.returncode == 0, stderr
+    modules = {l.rsplit("|", 1)[1].strip().split(".")[0] for l in stderr.splitlines() if l.startswith("import time:")}
+    return elapsed, usage.ru_maxrss / 2**10, modules
+
+@click.command()
+@click.option("--repeat", "-r", type=int, default=5, help="runs of each target, the median is reported")
+@click.option("--output", "-o", type=Path, default=None, help="file path to save the json report")
+def main(repeat, output):
+    report = {}
+    print(f"{'target':>20s} {'seconds':>9s} {'rss':>9s}  heavy imports")
+    for name, args in targets.items():
+        runs = [run_once(args) for _ in range(repeat)]
+        loaded = [m for m in heavy if m in runs[0][2]]
+        report[name] = {"seconds": median(r[0] for r in runs), "rss_mb": median(r[1] for r in runs), "heavy": loaded}
+        print(f"{name:>20s} {report[name]['seconds']:>8.3f}s {report[name]['rss_mb']:>7.1f}MB  {', '.join(loaded) or '-'}")
+    if output: json.dump(report, open(output, "w"), indent=2)
+
+if __name__ == "__main__":
+    main()
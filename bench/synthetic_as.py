@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : synthetic as topology answering fake probe tools
+# * Last change   : 07:34:18 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import os
+import json
+import zlib
+import bisect
+import random
+import ipaddress as ipa
+
+N_MONITOR_HOP = 4 # hops between the monitor and the as backbone
+
+def make_as(n_target, seed=0, n_core=16, dead_ratio=0.1, live_ratio=0.2, latency=0.0005, loss=0.0):
+    """
+    announced prefixes holding about n_target /24 gateways, carved from
+    10.0.0.0/8, some announced together with a covering prefix
+    """
+    rng = random.Random(seed)
+    prefixes, base, total = [], int(ipa.IPv4Address("10.0.0.0")), 0
+    while total < n_target:
+        prefixlen = max(rng.choice([16, 18, 20, 20, 22, 22, 24, 24]), 24 - (n_target - total).bit_length() + 1)
+        size = 1 << (32 - prefixlen)
+        base = (base + size - 1) // size * size
+        prefix = ipa.IPv4Network((base, prefixlen))
+        prefixes.append(str(prefix))
+        if prefixlen < 24 and rng.random() < 0.2: # more-specific announced as well
+            prefixes.append(str(next(prefix.subnets(new_prefix=prefixlen+2))))
+        base += size
+        total += size >> 8
+    return {"seed": seed, "prefixes": prefixes, "n_core": n_core, "dead_ratio": dead_ratio,
+            "live_ratio": live_ratio, "latency": latency, "loss": loss}
+
+def load_as(path=None):
+    cfg = json.load(open(path or os.environ["FAKE_AS"], "r"))
+    nets = list(ipa.collapse_addresses(map(ipa.IPv4Network, cfg["prefixes"])))
+    cfg["_starts"] = [int(n.network_address) for n in nets]
+    cfg["_ends"] = [int(n.broadcast_address) + 1 for n in nets]
+    return cfg
+
+def _hash(cfg, *keys):
+    return zlib.crc32(f"{cfg['seed']}|{'|'.join(map(str, keys))}".encode()) / 2**32
+
+def announced(cfg, ip_addr):
+    ip_addr = int(ipa.IPv4Address(ip_addr))
+    i = bisect.bisect_right(cfg["_starts"], ip_addr) - 1
+    return i >= 0 and ip_addr < cfg["_ends"][i]
+
+def hop_path(cfg, ip_addr): # hops towards ip_addr, ending with None when the rest does not answer
+    a, b, c, d = map(int, str(ip_addr).split("."))
+    path = [f"192.168.{i}.1" for i in range(N_MONITOR_HOP)]
+    path.append(f"100.64.{int(_hash(cfg, a, b) * cfg['n_core'])}.1")
+    if not announced(cfg, ip_addr):
+        return path + [None]
+    path.append(f"{a}.{b}.{c // 16 * 16}.254")
+    if _hash(cfg, "dead", a, b, c) < cfg["dead_ratio"]:
+        return path + [None]
+    return path + [str(ip_addr)]
+
+def is_live(cfg, ip_addr):
+    return announced(cfg, ip_addr) and _hash(cfg, "live", ip_addr) < cfg["live_ratio"]
+
+def host_info(cfg, ip_addr):
+    h = _hash(cfg, "os", ip_addr)
+    if h < 0.5: return {"os": "Linux", "osgen": "3.X", "name": "Linux 3.2 - 4.9", "type": "general purpose", "device": None}
+    if h < 0.8: return {"os": "Windows", "osgen": "10", "name": "Microsoft Windows 10 1607", "type": "general purpose", "device": None}
+    return {"os": "RouterOS", "osgen": "6.X", "name": "MikroTik RouterOS 6.36", "type": "router", "device": "router"}
+
+if __name__ == "__main__":
+    import sys
+    json.dump(make_as(int(sys.argv[1])), sys.stdout, indent=2)
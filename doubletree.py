@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : doubletree-style discovery with shared stop sets
+# * Last change   : 08:21:47 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import asyncio
+import ipaddress as ipa
+from contextlib import aclosing
+
+import metrics
+from probe_scheduler import TRACEROUTE_CMD
+
+def parse_hop(text): # NOTE: could raise error
+    items = text.strip().split("\n")[-1].strip().split()
+    if items[1] == "*":
+        return None, None
+    ipa.IPv4Address(items[1])
+    return items[1], float(items[2])
+
+async def stream_hops(ip_addr, first_ttl, max_ttl, timeout=5):
+    """
+    (hop, delay) of ttl first_ttl, first_ttl+1, ... from one traceroute as it
+    prints them, (None, None) for a `*`, timeout applies to each hop,
+    the process is killed when the caller stops reading before its end
+    """
+    cmd = TRACEROUTE_CMD + ["-f", str(first_ttl), "-m", str(max_ttl), str(ip_addr)]
+    proc = await asyncio.create_subprocess_exec(*cmd,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    metrics.inc("probes")
+    finished = False # traceroute exits by itself at its end or at the target
+    try:
+        await asyncio.wait_for(proc.stdout.readline(), timeout) # header
+        while True:
+            try: line = await asyncio.wait_for(proc.stdout.readline(), timeout)
+            except asyncio.TimeoutError:
+                metrics.inc("probe_timeouts")
+                raise
+            if not line:
+                finished = True
+                break
+            hop, d = parse_hop(line.decode())
+            finished = hop == str(ip_addr)
+            yield hop, d
+    finally:
+        # NOTE: killing an exited but unreaped process races asyncio's child watcher
+        if not finished and proc.returncode is None: proc.kill()
+        await proc.wait()
+
+class DoubleTree:
+    """
+    One traceroute from start_ttl-1 onwards, read hop by hop until the
+    target or a `*`. When the hop at start_ttl-1 is already known from any
+    trace (global stop set), the route up to it is stitched from that trace,
+    otherwise one more traceroute probes the ttls below, shared by every
+    target waiting on the same hop meanwhile. With destination-based routing
+    the result equals a full traceroute, mostly in one process per target
+    and without the probes near the monitor.
+    """
+    def __init__(self, start_ttl=8, max_ttl=30, stream=stream_hops):
+        self.start_ttl = start_ttl
+        self.max_ttl = max_ttl
+        self.stream = stream
+        self.global_stop = {} # hop -> (route, delay) from the monitor up to hop
+        self.pending = {} # hop at start_ttl-1 -> task probing the ttls below it
+        self.n_process = 0 # traceroute processes spawned
+        self.n_probe = 0 # ttls read from them
+        self.n_hop = 0 # ttls of the traces returned, a full traceroute probes each
+
+    @property
+    def n_saved(self):
+        return self.n_hop - self.n_probe
+
+    async def leg(self, ip_addr, first_ttl, max_ttl): # (route, delay, reachable) up to the target or a `*`
+        route, delay = [], []
+        self.n_process += 1
+        async with aclosing(self.stream(ip_addr, first_ttl, max_ttl)) as hops:
+            async for hop, d in hops:
+                self.n_probe += 1
+                if hop is None: return route, delay, False
+                route.append(hop)
+                delay.append(d)
+                if hop == str(ip_addr): break
+        return route, delay, True
+
+    async def below(self, ip_addr, head): # (route, delay, complete) of the ttls below head
+        if head is None or head == str(ip_addr):
+            return await self.leg(ip_addr, 1, self.start_ttl-2)
+        if head not in self.pending:
+            self.pending[head] = asyncio.ensure_future(self.leg(ip_addr, 1, self.start_ttl-2))
+            self.pending[head].add_done_callback(lambda _: self.pending.pop(head, None))
+        return await self.pending[head]
+
+    async def trace(self, ip_addr):
+        first = max(self.start_ttl - 1, 1)
+        route, delay, reachable = await self.leg(ip_addr, first, self.max_ttl)
+        head = route[0] if route else None
+        if first > 1 and head in self.global_stop:
+            known_route, known_delay = self.global_stop[head]
+            route, delay = known_route + route[1:], known_delay + delay[1:]
+        elif first > 1:
+            b_route, b_delay, complete = await self.below(ip_addr, head)
+            if complete: # a `*` below ends the route, as it would end a full trace
+                route, delay = b_route + route, b_delay + delay
+            else:
+                route, delay, reachable = b_route, b_delay, False
+        if str(ip_addr) in route: # path is shorter than start_ttl
+            idx = route.index(str(ip_addr)) + 1
+            route, delay, reachable = route[:idx], delay[:idx], True
+
+        self.n_hop += len(route) + (0 if reachable else 1)
+        if not route: return None
+        for i, hop in enumerate(route):
+            if hop not in self.global_stop:
+                self.global_stop[hop] = (route[:i+1], delay[:i+1])
+        return {
+            "target": str(ip_addr),
+            "route": route,
+            "delay": delay,
+            "reachable": reachable,
+        }
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : incremental ip embedding with a persistent cache
+# * Last change   : 08:07:16 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+from pathlib import Path
+
+import numpy as np
+
+from ip_array import ip_to_uint32
+
+POPCOUNT16 = np.unpackbits(np.arange(1 << 16, dtype=">u2").view(np.uint8).reshape(-1, 2), axis=1).sum(axis=1)
+
+def ip_bits(ips): # uint32 array -> (n, 32) bit features, most significant bit first
+    return np.unpackbits(np.asarray(ips, dtype=">u4").view(np.uint8).reshape(-1, 4), axis=1)
+
+def hamming(a, b): # pairwise bit distance between two uint32 arrays
+    x = np.asarray(a, dtype=np.uint32)[:, None] ^ np.asarray(b, dtype=np.uint32)[None, :]
+    return POPCOUNT16[x & 0xffff] + POPCOUNT16[x >> 16]
+
+def tsne(ips, init="pca"):
+    from sklearn.manifold import TSNE
+    return TSNE(n_components=2, init=init, n_jobs=8).fit_transform(ip_bits(ips)).astype(np.float32)
+
+def place(ips, known, coords, k=5, chunk=1024): # out-of-sample: mean of the k nearest known nodes
+    ret = np.empty((len(ips), 2), dtype=np.float32)
+    k = min(k, len(known))
+    for i in range(0, len(ips), chunk):
+        d = hamming(ips[i:i+chunk], known)
+        nn = np.argpartition(d, k-1, axis=1)[:, :k]
+        ret[i:i+chunk] = coords[nn].mean(axis=1)
+    # nodes sharing all neighbors would overlap, spread them slightly
+    jitter = np.random.default_rng(0).normal(size=ret.shape) * coords.std(axis=0) * 0.01
+    return ret + jitter.astype(np.float32)
+
+def load_emb_cache(path):
+    if not Path(path).exists(): return np.empty(0, dtype=np.uint32), np.empty((0, 2), dtype=np.float32)
+    cache = np.load(path)
+    return cache["nodes"], cache["coords"]
+
+def save_emb_cache(path, nodes, coords):
+    with open(path, "wb") as f: np.savez(f, nodes=nodes, coords=coords)
+
+def update_emb(nodes, cache_path, k=5, refit_ratio=0.5):
+    """
+    embed nodes (dotted-quad strings) against the cached layout, new nodes are
+    placed out of sample next to their nearest known nodes, or when there are
+    more than refit_ratio of them, by TSNE warm-started from the cached layout
+    """
+    ips = ip_to_uint32(nodes)
+    known, coords = load_emb_cache(cache_path)
+    new = np.setdiff1d(ips, known)
+
+    if len(new):
+        if len(known) == 0:
+            print(f"embedding {len(new)} nodes from scratch...")
+            known, coords = new, tsne(new)
+        elif len(new) > refit_ratio * len(ips):
+            print(f"embedding {len(new)} new nodes warm-started from {len(known)} cached...")
+            known = np.concatenate([known, new])
+            coords = tsne(known, init=np.concatenate([coords, place(new, known[:len(coords)], coords, k=k)]))
+        else:
+            print(f"placing {len(new)} new nodes next to {len(known)} cached...")
+            coords = np.concatenate([coords, place(new, known, coords, k=k)])
+            known = np.concatenate([known, new])
+        order = np.argsort(known)
+        known, coords = known[order], coords[order]
+        save_emb_cache(cache_path, known, coords)
+
+    idx = np.searchsorted(known, ips)
+    return dict(zip(nodes, coords[idx]))
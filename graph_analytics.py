@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : backbone analytics on the csr topology graph
+# * Last change   : 07:47:20 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import numpy as np
+
+import metrics
+from graph_build import csr_degree, to_scipy
+from ip_array import uint32_to_ip
+
+def _rows(g): # source node of every csr entry
+    return np.repeat(np.arange(len(g.nodes)), np.diff(g.indptr))
+
+def adjacency(g): # scipy csr matrix without self loops, float for path counting
+    A = to_scipy(g).astype(np.float64)
+    A.setdiag(0)
+    A.eliminate_zeros()
+    return A
+
+def degree(g):
+    return csr_degree(g)
+
+def components(g): # (number of components, component label per node)
+    from scipy.sparse.csgraph import connected_components
+    return connected_components(to_scipy(g), directed=False)
+
+@metrics.timed("core_number")
+def core_number(g):
+    """
+    k-core decomposition by peeling every node of degree <= k at once,
+    each round is one bincount over the edges of the peeled nodes
+    """
+    rows, cols = _rows(g), g.indices
+    keep = rows != cols # self loops do not count, as in networkx
+    rows, cols = rows[keep], cols[keep]
+    deg = np.bincount(rows, minlength=len(g.nodes))
+    core = np.full(len(g.nodes), -1, dtype=np.int64)
+    alive = np.ones(len(g.nodes), dtype=bool)
+    k = 0
+    while alive.any():
+        peel = alive & (deg <= k)
+        if not peel.any():
+            k = deg[alive].min()
+            continue
+        core[peel] = k
+        alive &= ~peel
+        edges = peel[rows] & alive[cols]
+        deg -= np.bincount(cols[edges], minlength=len(g.nodes))
+    return core
+
+@metrics.timed("betweenness")
+def betweenness(g, k=None, seed=0, batch=64, normalized=True):
+    """
+    Brandes betweenness from k sampled sources (all nodes when k is None),
+    a batch of sources at once: the bfs frontier and the dependency
+    accumulation are sparse matrix products over (n, batch) arrays,
+    scaled as networkx.betweenness_centrality(k=k)
+    """
+    A = adjacency(g)
+    n = A.shape[0]
+    sources = np.arange(n) if k is None or k >= n else np.random.default_rng(seed).choice(n, k, replace=False)
+    bc = np.zeros(n)
+    for i in range(0, len(sources), batch):
+        s = sources[i:i+batch]
+        cols = np.arange(len(s))
+        dist = np.full((n, len(s)), -1, dtype=np.int64)
+        sigma = np.zeros((n, len(s)))
+        dist[s, cols], sigma[s, cols] = 0, 1
+        frontier, level = sigma.copy(), 0
+        while frontier.any(): # shortest path counts, one bfs level at a time
+            paths = A @ frontier
+            new = (paths > 0) & (dist < 0)
+            level += 1
+            dist[new], sigma[new] = level, paths[new]
+            frontier = np.where(new, paths, 0)
+        delta = np.zeros((n, len(s)))
+        for l in range(level, 0, -1): # dependencies, from the farthest level back
+            w = dist == l
+            coef = np.where(w, (1 + delta) / np.where(w, sigma, 1), 0)
+            v = dist == l-1
+            delta[v] += (sigma * (A @ coef))[v]
+        delta[s, cols] = 0
+        bc += delta.sum(axis=1)
+
+    if normalized: scale = 1 / ((n-1) * (n-2)) if n > 2 else None
+    else: scale = 0.5 # each path counted from both ends
+    if scale is not None and k is not None and k < n: scale *= n / k
+    return bc * scale if scale is not None else bc
+
+def rank_nodes(g, k=256, seed=0):
+    """
+    ranked node table for backbone identification: degree, k-core,
+    connected component and sampled betweenness of every node, the most
+    central first (betweenness, then core, then degree)
+    """
+    import pandas as pd
+    n_comp, label = components(g)
+    size = np.bincount(label, minlength=n_comp)
+    df = pd.DataFrame({
+        "node": uint32_to_ip(g.nodes),
+        "degree": degree(g),
+        "core": core_number(g),
+        "component": label,
+        "component_size": size[label],
+        "betweenness": betweenness(g, k=k, seed=seed),
+    })
+    return df.sort_values(["betweenness", "core", "degree"], ascending=False, kind="stable", ignore_index=True)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : vectorized edge list & csr graph of discovered hops
+# * Last change   : 07:36:32 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+from collections import namedtuple
+
+import numpy as np
+
+from ip_array import ip_to_uint32, uint32_to_ip
+from trace_store import TraceStore, store_edges
+
+# neighbors of nodes[i] are nodes[indices[indptr[i]:indptr[i+1]]], nodes sorted
+CSRGraph = namedtuple("CSRGraph", ["nodes", "indptr", "indices"])
+
+def edge_array(traces): # hop pairs of all routes, (n, 2) uint32
+    if isinstance(traces, TraceStore): return store_edges(traces)
+    routes = [trace["route"] for trace in traces]
+    offsets = np.cumsum([0] + list(map(len, routes)))
+    hops = ip_to_uint32([hop for route in routes for hop in route])
+    return store_edges(TraceStore(None, offsets, hops, None, None))
+
+def dedup_edges(edges): # undirected, each edge once as (small, large)
+    edges = np.sort(np.asarray(edges, dtype=np.uint32).reshape(-1, 2), axis=1)
+    keys = np.unique((edges[:, 0].astype(np.uint64) << 32) | edges[:, 1])
+    return np.stack([keys >> 32, keys & 0xffffffff], axis=1).astype(np.uint32)
+
+def build_csr(edges):
+    edges = dedup_edges(edges)
+    nodes = np.unique(edges)
+    u, v = np.searchsorted(nodes, edges[:, 0]), np.searchsorted(nodes, edges[:, 1])
+    loop = u == v # self loop stored once
+    rows = np.concatenate([u, v[~loop]])
+    cols = np.concatenate([v, u[~loop]])
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(len(nodes)+1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(nodes)), out=indptr[1:])
+    return CSRGraph(nodes, indptr, cols[order].astype(np.int64))
+
+def graph_from_traces(traces):
+    return build_csr(edge_array(traces))
+
+def csr_degree(g):
+    return np.diff(g.indptr)
+
+def csr_edges(g): # each undirected edge once, as node indices
+    rows = np.repeat(np.arange(len(g.nodes)), np.diff(g.indptr))
+    keep = rows <= g.indices
+    return np.stack([rows[keep], g.indices[keep]], axis=1)
+
+def to_scipy(g):
+    import scipy.sparse as sp
+    n = len(g.nodes)
+    return sp.csr_matrix((np.ones(len(g.indices), dtype=np.int8), g.indices, g.indptr), shape=(n, n))
+
+def to_networkx(g):
+    import networkx as nx
+    names = uint32_to_ip(g.nodes)
+    G = nx.Graph()
+    G.add_edges_from((names[a], names[b]) for a, b in csr_edges(g))
+    return G
+
+def to_peer_map(g): # string keyed dict of sets, as get_peer_map returns
+    names = uint32_to_ip(g.nodes)
+    return {names[i]: {names[j] for j in g.indices[g.indptr[i]:g.indptr[i+1]]} for i in range(len(names))}
+
+def _edge_keys(g): # each edge as one uint64 of its node addresses
+    e = g.nodes[csr_edges(g)].astype(np.uint64)
+    return (e[:, 0] << 32) | e[:, 1]
+
+def _keys_to_ip(keys):
+    return list(zip(uint32_to_ip(keys >> 32), uint32_to_ip(keys & 0xffffffff)))
+
+def diff_graphs(old, new): # edge-level diff of two CSR graphs
+    old_keys, new_keys = _edge_keys(old), _edge_keys(new)
+    return {
+        "added_nodes": uint32_to_ip(np.setdiff1d(new.nodes, old.nodes)),
+        "removed_nodes": uint32_to_ip(np.setdiff1d(old.nodes, new.nodes)),
+        "added_links": _keys_to_ip(np.setdiff1d(new_keys, old_keys)),
+        "removed_links": _keys_to_ip(np.setdiff1d(old_keys, new_keys)),
+    }
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : uint32 encoding of ipv4 addresses
+# * Last change   : 07:25:30 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import socket
+import numpy as np
+
+def ip_to_uint32(ips): # dotted-quad strings -> uint32 array
+    return np.frombuffer(b"".join(map(socket.inet_aton, ips)), dtype=">u4").astype(np.uint32)
+
+def uint32_to_ip(arr): # uint32 array -> dotted-quad strings
+    buf = np.asarray(arr, dtype=">u4").tobytes()
+    return [socket.inet_ntoa(buf[i:i+4]) for i in range(0, len(buf), 4)]
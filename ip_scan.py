@@ -2,31 +2,78 @@
 #-*- coding: utf-8 -*-
 # **********************************************************************
 # * Description   : ip asset scanning based on masscan & nmap
-# * Last change   : 22:37:09 2020-12-19
+# * Last change   : 08:24:16 2026-10-18
 # * Author        : Yihao Chen
 # * Email         : chenyiha17@mails.tsinghua.edu.cn
 # * License       : www.opensource.org/licenses/bsd-license.php
 # **********************************************************************
 
 import re
+import time
+import random
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import ipaddress as ipa
+import xml.etree.ElementTree as ET
+
+import metrics
+from rate_control import AIMDController
+
+def parse_masscan(line): # ip of a "Discovered open port 80/tcp on x.x.x.x" line
+    items = line.strip().split()
+    if not items or items[0] != "Discovered":
+        return None
+    ipa.IPv4Address(items[-1])
+    return items[-1]
+
+def masscan_stream(prefix, rate=10000, timeout=None, wait=None): # yield live hosts as masscan reports them
+    targets = list(map(str, prefix)) if isinstance(prefix, list) else [str(prefix)]
+    cmd = ["masscan", *targets, "--rate", str(rate), "-p80", "--ping"]
+    if wait is not None: cmd += ["--wait", str(wait)] # seconds to wait for replies after sending, 10 by default
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    timer = threading.Timer(timeout, proc.kill) if timeout else None
+    if timer: timer.start()
+    seen = set()
+    try:
+        for l in proc.stdout:
+            try: ip = parse_masscan(l.decode())
+            except Exception as e:
+                print(e)
+                continue
+            if ip is not None and ip not in seen:
+                seen.add(ip)
+                metrics.inc("masscan_hosts")
+                yield ip
+    finally:
+        if timer: timer.cancel()
+        if proc.poll() is None: proc.kill()
+        proc.wait()
+    if proc.returncode < 0: print(f"masscan killed for {prefix}, {len(seen)} hosts so far")
 
 def masscan(prefix):
-    cmd = ["masscan", str(prefix), "--rate", "10000", "-p80", "--ping"]
-    output = subprocess.run(cmd, stdout=subprocess.PIPE, timeout=120)
-    ips = []
-    for l in output.stdout.decode().strip().split("\n"):
-        try:
-            items = l.strip().split()
-            if items[0] != "Discovered":
+    return list(masscan_stream(prefix))
+
+def masscan_adaptive(prefix, control, chunk_prefixlen=20, n_canary=8, wait=2):
+    """
+    scan the prefix chunk by chunk at control.limit(prefix) packets per second,
+    each chunk re-probes a few hosts found live in earlier chunks, canaries
+    that do not answer again are the loss rate fed back to the controller,
+    every chunk waits `wait` seconds for late replies instead of masscan's 10
+    """
+    key, prefix = str(prefix), ipa.IPv4Network(prefix)
+    chunks = prefix.subnets(new_prefix=chunk_prefixlen) if prefix.prefixlen < chunk_prefixlen else [prefix]
+    live = []
+    for chunk in chunks:
+        canaries = set(random.sample(live, min(n_canary, len(live))))
+        found = set()
+        for ip in masscan_stream([chunk, *canaries], rate=control.limit(key), wait=wait):
+            if ip in canaries:
+                found.add(ip)
                 continue
-            ipa.IPv4Address(items[-1])
-            ips.append(items[-1])
-        except Exception as e:
-            print(e)
-            continue
-    return ips
+            live.append(ip)
+            yield ip
+        for ip in canaries: control.observe(key, ip not in found)
 
 
 def nmap(ip_address):
@@ -44,9 +91,142 @@ def nmap(ip_address):
 
     cmd = ["nmap", "-nFA", str(ip_address)]
     try:
-        output = subprocess.run(cmd, stdout=subprocess.PIPE, timeout=600)
-        paras = output.stdout.decode().strip().split("\n\n")
-        for l in paras[0].split("\n")[3:]: parse_namp_result(l)
+        with metrics.timer("nmap"):
+            output = subprocess.run(cmd, stdout=subprocess.PIPE, timeout=600)
+        with metrics.timer("nmap_parse"):
+            paras = output.stdout.decode().strip().split("\n\n")
+            for l in paras[0].split("\n")[3:]: parse_namp_result(l)
     except Exception as e:
+        metrics.inc("nmap_errors")
         print(e)
+    metrics.inc("nmap_hosts")
+    return ret
+
+def _unique(items):
+    return list(dict.fromkeys(i for i in items if i))
+
+def parse_nmap_host(host): # <host> element -> the same dict nmap() gets from the text output
+    ret = {}
+    for addr in host.iter("address"):
+        if addr.get("addrtype") == "ipv4": ret["ip"] = addr.get("addr")
+    for extra in host.iter("extraports"):
+        ret["Not shown"] = f"{extra.get('count')} {extra.get('state')} ports"
+
+    osclasses = list(host.iter("osclass"))
+    osmatches = [(m.get("name"), int(m.get("accuracy", 0))) for m in host.iter("osmatch")]
+    device_types = _unique(c.get("type") for c in osclasses)
+    if device_types: ret["Device type"] = "|".join(device_types)
+    running = _unique(" ".join(filter(None, [c.get("osfamily"), c.get("osgen")])) for c in osclasses)
+    exact = [name for name, acc in osmatches if acc == 100]
+    if exact:
+        if running: ret["Running"] = ", ".join(running)
+        ret["OS details"] = ", ".join(exact)
+    elif osmatches:
+        if running: ret["Running (JUST GUESSING)"] = ", ".join(running)
+        ret["Aggressive OS guesses"] = ", ".join(f"{name} ({acc}%)" for name, acc in osmatches)
+    os_cpe = _unique(cpe.text for c in osclasses for cpe in c.iter("cpe"))
+    if os_cpe: ret["OS CPE"] = " ".join(os_cpe)
+    for d in host.iter("distance"):
+        ret["Network Distance"] = f"{d.get('value')} hops"
+
+    services = list(host.iter("service"))
+    info = [(k, _unique(svc.get(attr) for svc in services))
+            for k, attr in [("Host", "hostname"), ("OS", "ostype"), ("Device", "devicetype")]]
+    cpe = _unique(c.text for svc in services for c in svc.iter("cpe") if c.text and c.text[:6] in ("cpe:/o", "cpe:/h"))
+    info.append(("CPE", cpe))
+    info = "; ".join(f"{k}: {', '.join(v)}" for k, v in info if v)
+    if info: ret["Service Info"] = info
     return ret
+
+def nmap_batch(ips, timeout=None, host_timeout=600):
+    """
+    one nmap for many hosts, yield each host as its xml completes, nmap gives
+    up on a host after host_timeout seconds, the whole run is killed after
+    timeout, by default as long as the hosts one after another would take
+    """
+    if timeout is None: timeout = host_timeout * len(ips)
+    cmd = ["nmap", "-nFA", "--host-timeout", f"{host_timeout}s", "-oX", "-"] + list(map(str, ips))
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    timer = threading.Timer(timeout, proc.kill) if timeout else None
+    if timer: timer.start()
+    parser = ET.XMLPullParser(events=("end",))
+    try:
+        for chunk in iter(lambda: proc.stdout.read1(65536), b""):
+            t = time.perf_counter()
+            parser.feed(chunk)
+            hosts = []
+            for _, elem in parser.read_events():
+                if elem.tag == "host":
+                    hosts.append(parse_nmap_host(elem))
+                    elem.clear()
+            metrics.observe("nmap_parse", time.perf_counter() - t)
+            metrics.inc("nmap_hosts", len(hosts))
+            yield from hosts
+    except ET.ParseError as e:
+        print(e)
+    finally:
+        if timer: timer.cancel()
+        if proc.poll() is None: proc.kill()
+        proc.wait()
+
+def scan_pipeline(prefixes, n_worker=256, batch_size=1, on_detail=None, adaptive=False, keep_details=True):
+    """
+    feed every live host from masscan straight into a bounded pool of nmap
+    workers, with batch_size > 1 each worker runs one nmap over a batch of
+    hosts and parses its xml output as hosts complete, with adaptive the
+    masscan rate and the number of nmap workers follow AIMDController,
+    without keep_details details only go to on_detail, e.g. a ScanTableWriter
+    returns ({prefix: [ip, ...]}, {prefix: [detail, ...]})
+    """
+    active_ip = {str(p): [] for p in prefixes}
+    detail_ip = {str(p): [] for p in prefixes}
+    if adaptive:
+        rate_control = AIMDController("masscan", 10000, minimum=1000, maximum=100000, increase=2000, window=16)
+        worker_control = AIMDController("nmap", max(n_worker // 4, 1), maximum=n_worker, window=16)
+        limit = worker_control.limit
+    else:
+        limit = lambda: n_worker * 2 # batches waiting or being scanned
+    cond, inflight = threading.Condition(), [0]
+
+    def worker(p, ips):
+        done = {}
+        def emit(detail):
+            done[detail.get("ip")] = len(detail)
+            if keep_details: detail_ip[p].append(detail)
+            if on_detail: on_detail(p, detail)
+        try:
+            try:
+                for detail in [nmap(ips[0])] if batch_size == 1 else nmap_batch(ips): emit(detail)
+            except Exception as e:
+                metrics.inc("nmap_errors")
+                print(f"scan of {len(ips)} hosts in {p} failed: {e!r}")
+            for ip in ips: # nmap saw it down or the batch failed, keep one row per live ip as nmap() does
+                if ip not in done: emit({"ip": ip})
+            if adaptive: # masscan saw the host alive but nmap got nothing back
+                for ip in ips: worker_control.observe(None, done.get(ip, 0) <= 1)
+        finally:
+            with cond:
+                inflight[0] -= 1
+                cond.notify_all()
+
+    def submit(p, ips):
+        with cond:
+            cond.wait_for(lambda: inflight[0] < limit())
+            inflight[0] += 1
+        futures.append(executor.submit(worker, p, ips))
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=n_worker) as executor:
+        for p in map(str, prefixes):
+            print(f"scan active ip for {p}")
+            batch = []
+            for ip in masscan_adaptive(p, rate_control) if adaptive else masscan_stream(p):
+                active_ip[p].append(ip)
+                batch.append(ip)
+                if len(batch) >= batch_size:
+                    submit(p, batch)
+                    batch = []
+            if batch: submit(p, batch)
+            print(f"{len(active_ip[p])}")
+    for f in futures: f.result() # e.g. on_detail failing to write, the scan is not complete
+    return active_ip, detail_ip
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : lightweight run metrics, json & prometheus export
+# * Last change   : 08:25:11 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import os
+import re
+import json
+import time
+import cProfile
+import functools
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_start = time.time()
+counters, gauges, timers = {}, {}, {} # timers: name -> [count, total seconds, max seconds]
+
+# stages to run under cProfile, e.g. TD_PROFILE=graph_build,render
+profile_stages = set(filter(None, os.environ.get("TD_PROFILE", "").split(",")))
+profile_dir = Path(os.environ.get("TD_PROFILE_DIR", "."))
+
+def inc(name, n=1):
+    with _lock: counters[name] = counters.get(name, 0) + n
+
+def gauge(name, value):
+    with _lock: gauges[name] = value
+
+def observe(name, seconds):
+    with _lock:
+        t = timers.setdefault(name, [0, 0.0, 0.0])
+        t[0] += 1
+        t[1] += seconds
+        t[2] = max(t[2], seconds)
+
+@contextmanager
+def timer(name):
+    t = time.perf_counter()
+    try: yield
+    finally: observe(name, time.perf_counter() - t)
+
+def timed(name): # decorator form of timer
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name): return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def stage(name): # timer of a whole stage, under cProfile if asked for
+    prof = cProfile.Profile() if name in profile_stages else None
+    if prof: prof.enable()
+    try:
+        with timer(f"stage_{name}"): yield
+    finally:
+        if prof:
+            prof.disable()
+            profile_dir.mkdir(exist_ok=True, parents=True)
+            prof.dump_stats(profile_dir / f"{name}.prof")
+            print(f"profile of {name} saved at {profile_dir / f'{name}.prof'}")
+
+def snapshot():
+    with _lock:
+        uptime = time.time() - _start
+        return {
+            "time": time.time(),
+            "uptime": uptime,
+            "counters": dict(counters),
+            "rates": {k: v / uptime for k, v in counters.items()}, # per second over the run
+            "gauges": dict(gauges),
+            "timers": {k: {"count": c, "total": s, "mean": s / c, "max": m} for k, (c, s, m) in timers.items()},
+        }
+
+def _write(path, text): # readers never see a half written file
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+def write_json(path):
+    _write(path, json.dumps(snapshot(), indent=2))
+
+def write_prometheus(path, prefix="topology_discovery"):
+    snap = snapshot()
+    name = lambda k: re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{k}")
+    lines = [f"{name('uptime_seconds')} {snap['uptime']}"]
+    for k, v in snap["counters"].items():
+        lines += [f"# TYPE {name(k)}_total counter", f"{name(k)}_total {v}"]
+    for k, v in snap["gauges"].items():
+        lines += [f"# TYPE {name(k)} gauge", f"{name(k)} {v}"]
+    for k, v in snap["timers"].items():
+        lines += [f"# TYPE {name(k)}_seconds summary",
+                  f"{name(k)}_seconds_count {v['count']}", f"{name(k)}_seconds_sum {v['total']}",
+                  f"# TYPE {name(k)}_seconds_max gauge", f"{name(k)}_seconds_max {v['max']}"]
+    _write(path, "\n".join(lines) + "\n")
+
+def export(json_path=None, prom_path=None, prefix="topology_discovery"):
+    if json_path: write_json(json_path)
+    if prom_path: write_prometheus(prom_path, prefix=prefix)
+
+class Reporter: # export every `interval` seconds in the background, and once more on stop
+    def __init__(self, json_path=None, prom_path=None, interval=30, prefix="topology_discovery"):
+        self.paths = (json_path, prom_path)
+        self.interval, self.prefix = interval, prefix
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            export(*self.paths, prefix=self.prefix)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        export(*self.paths, prefix=self.prefix)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : longest-prefix-match index of ip prefixes
+# * Last change   : 08:24:56 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import ipaddress as ipa
+
+class RadixTree: # binary trie over address bits, one level per prefix length
+    def __init__(self):
+        self.root = [None, None, None] # [child 0, child 1, (network, value)]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, network, value):
+        network = ipa.IPv4Network(network)
+        addr, node = int(network.network_address), self.root
+        for i in range(network.prefixlen):
+            bit = (addr >> (31-i)) & 1
+            if node[bit] is None: node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None: self.size += 1
+        node[2] = (network, value)
+
+    def lookup(self, ip_addr): # (network, value) of the longest matching prefix, or None
+        addr, node = int(ipa.IPv4Address(ip_addr)), self.root
+        best = node[2]
+        for i in range(32):
+            node = node[(addr >> (31-i)) & 1]
+            if node is None: break
+            if node[2] is not None: best = node[2]
+        return best
+
+    def covering(self, ip_addr): # (network, value) of every matching prefix, most specific first
+        addr, node = int(ipa.IPv4Address(ip_addr)), self.root
+        found = [node[2]] if node[2] is not None else []
+        for i in range(32):
+            node = node[(addr >> (31-i)) & 1]
+            if node is None: break
+            if node[2] is not None: found.append(node[2])
+        return found[::-1]
+
+    def items(self):
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node[2] is not None: yield node[2]
+            stack.extend(c for c in node[:2] if c is not None)
+
+class PrefixIndex:
+    """
+    Announced prefixes flattened into sorted, non-overlapping uint32 intervals,
+    each owned by the most specific prefix covering it, so that longest prefix
+    match of a whole array of addresses is one searchsorted call.
+    """
+    def __init__(self, prefixes, values=None):
+        import numpy as np # NOTE: lazily, RadixTree is used by the stdlib only registry
+        from ip_array import ip_to_uint32
+        if values is None: values = prefixes
+        nets = {}
+        for p, v in zip(prefixes, values):
+            if ":" in p: continue # ipv4 only, dropped together with its value
+            nets.setdefault(str(ipa.IPv4Network(p, strict=False)), v)
+        self.prefixes = np.array(list(nets), dtype=object)
+        self.values = np.array(list(nets.values()), dtype=object)
+
+        base, masklen = zip(*(p.split("/") for p in self.prefixes)) if nets else ((), ())
+        start = ip_to_uint32(base).astype(np.int64)
+        masklen = np.array(masklen, dtype=np.int64)
+        end = start + (1 << (32 - masklen))
+        self.start, self.end = start, end
+
+        starts, owners, stack = [], [], []
+        def emit(pos, idx):
+            if starts and starts[-1] == pos: owners[-1] = idx
+            else:
+                starts.append(pos)
+                owners.append(idx)
+        for i in np.lexsort((masklen, start)).tolist(): # covering prefixes before their more-specifics
+            while stack and stack[-1][0] <= start[i]:
+                emit(stack.pop()[0], stack[-1][1] if stack else -1)
+            emit(int(start[i]), i)
+            stack.append((int(end[i]), i))
+        while stack:
+            emit(stack.pop()[0], stack[-1][1] if stack else -1)
+        self.starts = np.array(starts, dtype=np.int64)
+        self.owners = np.array(owners, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    @classmethod
+    def from_bgp_dump(cls, path):
+        """
+        `bgpdump -m` lines (TABLE_DUMP2|time|B|peer|peer_as|prefix|as_path|...)
+        or plain `prefix [origin_as]` lines, the value is the origin as, the
+        first origin seen for a prefix as in __init__, kept once per prefix
+        rather than once per peer
+        """
+        origins = {}
+        for l in open(path, "r"):
+            items = l.strip().split("|") if "|" in l else l.strip().split()
+            if not items or not items[0] or items[0].startswith("#"): continue
+            if len(items) > 6:
+                prefix, path_ = items[5], items[6].split()
+                origin = path_[-1] if path_ else None
+            else:
+                prefix, origin = items[0], items[1] if len(items) > 1 else None
+            if ":" in prefix: continue # ipv4 only
+            origins.setdefault(prefix, origin)
+        return cls(list(origins), list(origins.values()))
+
+    def lookup(self, ips): # index into self.prefixes of the longest match, -1 when none
+        import numpy as np
+        ips = np.asarray(ips, dtype=np.int64)
+        if not len(self.starts): return np.full(ips.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self.starts, ips, side="right") - 1
+        return np.where(pos >= 0, self.owners[np.maximum(pos, 0)], -1)
+
+    def label(self, ips, values=False): # matched prefix (or its value) for every address, None when none
+        import numpy as np
+        idx = self.lookup(ips)
+        names = np.append(self.values if values else self.prefixes, None)
+        return names[idx]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : probe planning over overlapping announced prefixes
+# * Last change   : 07:50:36 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import json
+import ipaddress as ipa
+from collections import namedtuple
+
+from probe_scheduler import gateway_targets
+from prefix_index import RadixTree
+
+# the announced prefixes flattened for probing
+#   ranges: non-overlapping networks covering every announced prefix
+#   targets: {announced prefix: [target, ...]}, each /24 gateway once, under
+#     its most specific announced prefix, so trace streams stay per prefix
+#   membership: {target: [announced prefix, ...]}, most specific first
+#   n_probe: targets of the prefixes expanded one by one, n_dup: duplicates among them
+PrefixPlan = namedtuple("PrefixPlan", ["ranges", "targets", "membership", "n_probe", "n_dup"])
+
+def normalize_prefixes(prefixes): # ipv4 networks, longer than /24 widened to their /24, deduplicated
+    nets = set()
+    for p in prefixes:
+        if ":" in str(p): continue
+        net = ipa.IPv4Network(p, strict=False)
+        nets.add(net.supernet(new_prefix=24) if net.prefixlen > 24 else net)
+    return sorted(nets)
+
+def plan_prefixes(prefixes):
+    nets = normalize_prefixes(prefixes)
+    tree = RadixTree()
+    for net in nets: tree.insert(net, str(net))
+    ranges, targets, membership = list(ipa.collapse_addresses(nets)), {}, {}
+    for r in ranges:
+        for t in gateway_targets(r):
+            covering = [v for _, v in tree.covering(t)]
+            targets.setdefault(covering[0], []).append(t)
+            membership[str(t)] = covering
+    n_probe = sum(max(ipa.IPv4Network(p, strict=False).num_addresses >> 8, 1) for p in prefixes if ":" not in str(p))
+    n_dup = n_probe - len(membership)
+    return PrefixPlan(ranges, targets, membership, n_probe, n_dup)
+
+def report_plan(plan):
+    print(f"{len(plan.targets)} prefixes in {len(plan.ranges)} ranges, {len(plan.membership)} targets, "
+          f"{plan.n_dup} of {plan.n_probe} probes ({plan.n_dup / max(plan.n_probe, 1):.1%}) saved by dedup")
+
+def save_plan(plan, path):
+    json.dump({
+        "ranges": list(map(str, plan.ranges)),
+        "targets": {p: list(map(str, v)) for p, v in plan.targets.items()},
+        "membership": plan.membership,
+        "n_probe": plan.n_probe,
+        "n_dup": plan.n_dup,
+    }, open(path, "w"))
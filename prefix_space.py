@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : prefix-space density over [start, end) intervals
+# * Last change   : 07:52:48 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+from collections import namedtuple
+
+import numpy as np
+
+from ip_array import ip_to_uint32
+
+# prefix i covers addresses [start[i], end[i]), int64 so that end may be 2**32
+Intervals = namedtuple("Intervals", ["start", "end", "masklen"])
+
+def prefix_intervals(prefixes):
+    prefixes = [p for p in prefixes if ":" not in p] # ipv4 only
+    parts = [p.partition("/") for p in prefixes]
+    masklen = np.array([m for _, _, m in parts], dtype=np.int64)
+    start = ip_to_uint32([b for b, _, _ in parts]).astype(np.int64) & ~((1 << (32 - masklen)) - 1)
+    return Intervals(start, start + (1 << (32 - masklen)), masklen)
+
+def coverage(iv):
+    """
+    number of prefixes covering each address, as a step function:
+    count[i] addresses are covered on [points[i], points[i+1])
+    """
+    points, idx = np.unique(np.concatenate([iv.start, iv.end]), return_inverse=True)
+    step = np.zeros(len(points), dtype=np.int64)
+    np.add.at(step, idx, np.concatenate([np.ones(len(iv.start), np.int64), -np.ones(len(iv.end), np.int64)]))
+    return points, np.cumsum(step)
+
+def cumulative(iv, x):
+    """
+    addresses covered below each x, every prefix counted (overlaps as many
+    times as they are announced), piecewise linear between coverage points
+    """
+    points, count = coverage(iv)
+    if not len(points): return np.zeros(len(x))
+    area = np.concatenate([[0], np.cumsum(count[:-1] * np.diff(points))])
+    return np.interp(x, points, area)
+
+def histogram(iv, bins=24, lo=None, hi=None):
+    """
+    /24 subnets of the prefixes falling into each of `bins` equal bins over
+    [lo, hi), the span of the prefixes by default, returns (counts, edges)
+    """
+    lo = iv.start.min() if lo is None else lo
+    hi = iv.end.max() if hi is None else hi
+    edges = np.linspace(lo, hi, bins+1)
+    return np.diff(cumulative(iv, edges)) / 256, edges
+
+def smooth_density(iv, n_point=512):
+    """
+    gaussian kde of the /24 subnets of the prefixes, with scott's bandwidth
+    from the exact mean & variance of the uniform intervals, computed as a
+    fine histogram convolved with the kernel, returns (x, density)
+    """
+    counts, edges = histogram(iv, bins=n_point)
+    x, width, total = (edges[:-1] + edges[1:]) / 2, edges[1] - edges[0], counts.sum()
+    w = (iv.end - iv.start).astype(np.float64)
+    s, e = iv.start.astype(np.float64), iv.end.astype(np.float64)
+    mean = (w * (s + e) / 2).sum() / w.sum()
+    var = (w * (s*s + s*e + e*e) / 3).sum() / w.sum() - mean**2
+    bw = np.sqrt(max(var, 0)) * total ** (-1/5)
+    if bw > width:
+        half = int(4 * bw / width)
+        kernel = np.exp(-0.5 * (np.arange(-half, half+1) * width / bw) ** 2)
+        counts = np.convolve(counts, kernel / kernel.sum(), mode="same")
+    return x, counts / total / width
+
+def covered_ranges(iv): # [start, end) of the address space covered by any prefix, merged
+    points, count = coverage(iv)
+    on = count > 0
+    change = np.flatnonzero(np.diff(np.concatenate([[False], on])))
+    bounds = points[change]
+    return bounds[0::2], bounds[1::2]
+
+def per_slash8(iv): # prefixes touching each /8, without expanding the prefixes
+    diff = np.zeros(257, dtype=np.int64)
+    np.add.at(diff, iv.start >> 24, 1)
+    np.add.at(diff, ((iv.end - 1) >> 24) + 1, -1)
+    return np.cumsum(diff[:-1])
+
+def pick_ticks(counts, min_gap=10):
+    """
+    /8s with the most prefixes first, skipping any within min_gap of one
+    already picked, returns picked /8s in pick order
+    """
+    order = np.argsort(-counts, kind="stable")
+    order = order[counts[order] > 0]
+    blocked, picked = np.zeros(len(counts) + 2*min_gap + 1, dtype=bool), []
+    for i in order: # at most 256 rounds
+        if blocked[i + min_gap]: continue
+        picked.append(i)
+        blocked[i:i + 2*min_gap + 1] = True
+    return np.array(picked, dtype=np.int64)
+
+def tick_labels(prefixes, iv, slash8):
+    """
+    first prefix (in the given order) starting in each /8, the /8 itself
+    for a /8 only covered by a shorter prefix
+    """
+    prefixes = [p for p in prefixes if ":" not in p]
+    first = np.full(256, len(prefixes), dtype=np.int64)
+    np.minimum.at(first, iv.start >> 24, np.arange(len(prefixes)))
+    return [prefixes[first[i]] if first[i] < len(prefixes) else f"{i}.0.0.0/8" for i in slash8]
+
+def length_breakdown(iv): # (prefix lengths, counts), most common first
+    l, c = np.unique(iv.masklen, return_counts=True)
+    idx = np.argsort(c, kind="stable")[::-1]
+    return l[idx], c[idx]
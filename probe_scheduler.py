@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : asyncio probe scheduler shared by all prefixes
+# * Last change   : 08:22:35 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import time
+import asyncio
+import ipaddress as ipa
+from collections import Counter, deque
+
+import metrics
+from rate_control import AIMDController
+
+TRACEROUTE_CMD = ["traceroute", "-4nI", "-q", "1", "-w", "2"]
+
+def parse_traceroute(text, ip_addr): # NOTE: could raise error
+    route, delay, reachable = [], [], True
+    for l in text.strip().split("\n")[1:]:
+        items = l.strip().split()
+        if items[1] == "*":
+            reachable = False
+            break
+        ipa.IPv4Address(items[1])
+        route.append(items[1])
+        delay.append(float(items[2]))
+    return {
+        "target": str(ip_addr),
+        "route": route,
+        "delay": delay,
+        "reachable": reachable,
+    } if route else None
+
+async def run_probe(cmd, timeout): # stdout of one probe process, killed after timeout
+    t = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(*cmd,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    metrics.observe("probe_spawn", time.perf_counter() - t)
+    metrics.inc("probes")
+    try:
+        with metrics.timer("probe_wait"):
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        metrics.inc("probe_timeouts")
+        proc.kill()
+        await proc.wait()
+        raise
+    return stdout.decode()
+
+async def trace_route_async(ip_addr, timeout=10, max_ttl=None):
+    cmd = TRACEROUTE_CMD + (["-m", str(max_ttl)] if max_ttl else []) + [str(ip_addr)]
+    stdout = await run_probe(cmd, timeout)
+    with metrics.timer("traceroute_parse"):
+        return parse_traceroute(stdout, ip_addr)
+
+def gateway_targets(prefix): # the gateway of each /24 subnet
+    prefix = ipa.IPv4Network(prefix)
+    assert prefix.prefixlen <= 24
+    return [subnet[1] for subnet in prefix.subnets(new_prefix=24)]
+
+def _next_prefix(ready, inflight, n_per_prefix): # round robin over prefixes below their fairness limit
+    for _ in range(len(ready)):
+        p = ready[0]
+        ready.rotate(-1)
+        if inflight[p] < n_per_prefix(p):
+            return p
+    return None
+
+async def schedule(targets, tracer=trace_route_async, n_concurrency=256, n_per_prefix=64,
+                   on_trace=None, on_prefix_done=None, control=None, prefix_control=None, n_retry=0, backoff=1):
+    """
+    targets: {prefix: [target, ...]}, every target of every prefix shares one pipeline
+    on_trace(prefix, target, trace): called as soon as a trace completes (trace may be None)
+    on_prefix_done(prefix): called once all targets of a prefix completed
+    control, prefix_control: AIMDController adjusting the global and per-prefix
+        limits at runtime from timeouts and `*` hops
+    n_retry: a lost trace (timeout or `*` hop) is traced again up to n_retry
+        times, after backoff * 2**i seconds, before it is handed to on_trace
+    """
+    global_limit = (lambda: control.limit()) if control else (lambda: n_concurrency)
+    prefix_limit = prefix_control.limit if prefix_control else (lambda p: n_per_prefix)
+    queues = {p: deque(v) for p, v in targets.items()}
+    remaining = {p: len(v) for p, v in queues.items()}
+    ready = deque(p for p, v in queues.items() if v)
+    inflight = Counter()
+    running = {}
+
+    async def worker(p, target):
+        for i in range(n_retry + 1):
+            if i: # NOTE: the slot is held while backing off, load drops with it
+                metrics.inc("trace_retries")
+                await asyncio.sleep(backoff * 2 ** (i-1))
+            try: trace = await tracer(target)
+            except: trace = None
+            lost = trace is None or not trace["reachable"] # timeout or `*` hop
+            metrics.inc("traces")
+            if lost: metrics.inc("traces_lost")
+            if control: control.observe(None, lost)
+            if prefix_control: prefix_control.observe(p, lost)
+            if not lost: break
+        return trace
+
+    for p in [p for p, n in remaining.items() if n == 0]:
+        if on_prefix_done: on_prefix_done(p)
+
+    while ready or running:
+        while len(running) < global_limit():
+            p = _next_prefix(ready, inflight, prefix_limit)
+            if p is None: break
+            target = queues[p].popleft()
+            if not queues[p]: ready.remove(p)
+            inflight[p] += 1
+            running[asyncio.ensure_future(worker(p, target))] = (p, target)
+        metrics.gauge("traces_inflight", len(running))
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            p, target = running.pop(task)
+            inflight[p] -= 1
+            remaining[p] -= 1
+            if on_trace: on_trace(p, target, task.result())
+            if remaining[p] == 0 and on_prefix_done: on_prefix_done(p)
+
+def trace_targets(targets, **kwargs):
+    return asyncio.run(schedule(targets, **kwargs))
+
+def trace_gateways(prefixes, on_prefix_done=None, **kwargs):
+    """
+    trace the gateway of each /24 subnet for all prefixes at once,
+    returns {prefix: [trace, ...]}
+    """
+    traces = {p: [] for p in prefixes}
+    def on_trace(p, target, trace):
+        if trace is not None: traces[p].append(trace)
+    def prefix_done(p):
+        if on_prefix_done: on_prefix_done(p, traces.pop(p))
+    trace_targets({p: gateway_targets(p) for p in prefixes},
+            on_trace=on_trace, on_prefix_done=prefix_done if on_prefix_done else None, **kwargs)
+    return traces
+
+def probe_controls(n_concurrency=256, n_per_prefix=64, n_retry=2): # global & per-prefix aimd limits, lost traces retried
+    return {
+        "control": AIMDController("trace", n_concurrency // 4, minimum=4, maximum=n_concurrency, increase=4),
+        "prefix_control": AIMDController("trace/prefix", n_per_prefix // 4, minimum=1, maximum=n_per_prefix, window=16),
+        "n_retry": n_retry,
+    }
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : aimd control of probe rate & concurrency
+# * Last change   : 07:32:03 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import threading
+
+class AIMDController:
+    """
+    Additive increase / multiplicative decrease of a limit (workers, probes per
+    second, ...) kept per key, e.g. per prefix, key None for a global limit.
+    Every `window` observations the loss rate is compared with the lowest loss
+    rate seen for the key so far: targets that never answer are lost at any
+    speed, only loss above that baseline by `threshold` means congestion.
+    """
+    def __init__(self, name, initial, minimum=1, maximum=None, increase=1, decrease=0.5,
+                 window=32, threshold=0.1, log=print):
+        self.name = name
+        self.initial, self.minimum, self.maximum = initial, minimum, maximum or initial
+        self.increase, self.decrease = increase, decrease
+        self.window, self.threshold = window, threshold
+        self.log = log
+        self.limits, self.counts, self.baseline = {}, {}, {}
+        self.lock = threading.Lock()
+
+    def limit(self, key=None):
+        return self.limits.get(key, self.initial)
+
+    def observe(self, key, lost):
+        with self.lock:
+            n, n_lost = self.counts.get(key, (0, 0))
+            n, n_lost = n + 1, n_lost + bool(lost)
+            if n < self.window:
+                self.counts[key] = (n, n_lost)
+                return
+            self.counts[key] = (0, 0)
+            rate = n_lost / n
+            base = self.baseline[key] = min(self.baseline.get(key, rate), rate)
+            old = self.limit(key)
+            if rate > base + self.threshold:
+                new = max(self.minimum, type(old)(old * self.decrease))
+            else:
+                new = min(self.maximum, old + self.increase)
+            self.limits[key] = new
+        if new != old:
+            self.log(f"[{self.name}] {key or 'all'}: loss {rate:.1%} (baseline {base:.1%}), limit {old} -> {new}")
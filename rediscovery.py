@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : incremental re-discovery of stale traces
+# * Last change   : 08:18:56 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import json
+import time
+from collections import Counter
+
+from probe_scheduler import gateway_targets, trace_targets, trace_route_async
+from trace_stream import stream_path, legacy_path, repair_stream, append_trace, latest_traces
+
+async def verify_route(ip_addr, trace, probe_route=trace_route_async):
+    """
+    re-trace the known route in one traceroute, up to its last hop (one ttl
+    further for a route that ended with `*`), returns the new delays when
+    every hop answers again at its ttl, the target no earlier than before
+    and a `*` still where the route ended, None otherwise
+    """
+    route = trace["route"]
+    try: new = await probe_route(ip_addr, max_ttl=len(route) + (0 if trace["reachable"] else 1))
+    except Exception: return None
+    if new is None or new["route"] != route or new["reachable"] != trace["reachable"]: return None
+    return new["delay"]
+
+def refresh_tracer(old, tracer=trace_route_async, probe_route=trace_route_async, stats=None):
+    """
+    tracer for stale targets: targets whose known route still holds keep it
+    with fresh delays, only changed ones pay for a full trace
+    """
+    if stats is None: stats = Counter()
+    async def trace(ip_addr):
+        known = old.get(str(ip_addr))
+        if known and known["route"]:
+            delay = await verify_route(ip_addr, known, probe_route=probe_route)
+            if delay is not None:
+                stats["unchanged"] += 1
+                return {"target": known["target"], "route": known["route"], "delay": delay, "reachable": known["reachable"]}
+            stats["changed"] += 1
+        else:
+            stats["new"] += 1
+        return await tracer(ip_addr)
+    return trace
+
+def migrate_legacy(output_dir, prefix): # json list of a finished prefix -> stream records without time
+    path = legacy_path(output_dir, prefix)
+    if not path.exists(): return
+    with open(stream_path(output_dir, prefix), "a") as f:
+        for trace in json.load(open(path, "r")):
+            f.write(json.dumps(trace) + "\n")
+    (output_dir / "legacy").mkdir(exist_ok=True)
+    path.rename(output_dir / "legacy" / path.name)
+
+def refresh_gateways(prefixes, output_dir, ttl, tracer=trace_route_async, probe_route=trace_route_async, targets=None, **kwargs):
+    """
+    re-probe targets last traced more than ttl seconds ago (and targets never
+    traced), appending the results to the prefix streams, targets as in
+    trace_stream.stream_gateways, returns Counter of unchanged / changed / new targets
+    """
+    planned, targets = targets, {}
+    now, stats, old = time.time(), Counter(), {}
+    for p in (planned if planned is not None else prefixes):
+        migrate_legacy(output_dir, p)
+        path = stream_path(output_dir, p)
+        repair_stream(path)
+        latest = latest_traces(path) if path.exists() else {}
+        due = []
+        for t in (planned[p] if planned is not None else gateway_targets(p)):
+            trace = latest.get(str(t))
+            if trace is None or trace.get("time", 0) < now - ttl:
+                due.append(t)
+                if trace is not None: old[str(t)] = trace
+        if due: targets[p] = due
+
+    save = lambda p, target, trace: append_trace(stream_path(output_dir, p), target, trace)
+    trace_targets(targets, tracer=refresh_tracer(old, tracer=tracer, probe_route=probe_route, stats=stats),
+                  on_trace=save, **kwargs)
+    return stats
+
+def refresh_diff(prefixes, output_dir, ttl, **kwargs):
+    """
+    refresh_gateways with the edge-level diff of the topology before and
+    after saved as diff_<time>.json in output_dir, returns (stats, diff)
+    """
+    from glob import glob
+    from trace_store import get_trace_store
+    from graph_build import graph_from_traces, diff_graphs
+    load = lambda: graph_from_traces(get_trace_store(glob(str(output_dir / "trace_*")), output_dir / "store"))
+    old = load()
+    stats = refresh_gateways(prefixes, output_dir, ttl, **kwargs)
+    diff = diff_graphs(old, load())
+    diff_path = output_dir / f"diff_{time.strftime('%Y-%m-%d-%H%M%S')}.json"
+    json.dump(diff, open(diff_path, "w"))
+    print(", ".join(f"{len(v)} {k.replace('_', ' ')}" for k, v in diff.items()) + f", saved at {diff_path}")
+    return stats, diff
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : persistent registry cache keyed by allocated block
+# * Last change   : 08:03:58 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import re
+import json
+import time
+import threading
+import http.client
+import ipaddress as ipa
+from queue import LifoQueue, Empty
+from urllib.parse import urlsplit
+
+import metrics
+from prefix_index import RadixTree
+
+rx0 = re.compile(r"IP段名称：([a-zA-Z0-9-_]+?)<br>")
+rx1 = re.compile(r"IP段描述：([\s\S]+?)<br/>")
+rx_block = re.compile(r"(\d+\.\d+\.\d+\.\d+)\s*-\s*(\d+\.\d+\.\d+\.\d+)")
+
+def parse_info(text):
+    result = rx0.search(text)
+    r0 = result.group(1).replace("\n", " ").strip() if result else ""
+    result = rx1.search(text)
+    r1 = result.group(1).replace("\n", " ").strip() if result else ""
+    return r0, r1
+
+class RegistryError(Exception): # no usable answer, nothing is cached
+    pass
+
+def parse_block(text, ip_addr): # networks of the allocated block holding ip_addr, if the page names one
+    ip_addr = ipa.IPv4Address(ip_addr)
+    for a, b in rx_block.findall(text):
+        try: first, last = ipa.IPv4Address(a), ipa.IPv4Address(b)
+        except ValueError: continue
+        if first <= ip_addr <= last:
+            return list(ipa.summarize_address_range(first, last))
+    return [ipa.IPv4Network(ip_addr)]
+
+class ConnectionPool: # keep-alive connections to one host, dropped once idle for conn_ttl seconds
+    def __init__(self, base_url, size=16, timeout=10, conn_ttl=60):
+        url = urlsplit(base_url)
+        self.cls = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self.netloc, self.path = url.netloc, url.path.rstrip("/")
+        self.timeout, self.conn_ttl = timeout, conn_ttl
+        self.pool = LifoQueue(maxsize=size)
+
+    def get(self, path): # (status, body)
+        try:
+            conn, last_used = self.pool.get_nowait()
+            if time.time() - last_used > self.conn_ttl:
+                conn.close()
+                raise Empty
+        except Empty:
+            conn = self.cls(self.netloc, timeout=self.timeout)
+        for retry in (True, False): # a kept-alive connection may have been closed by the server
+            try:
+                conn.request("GET", f"{self.path}{path}")
+                resp = conn.getresponse()
+                body = resp.read().decode()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if not retry: raise
+                conn = self.cls(self.netloc, timeout=self.timeout)
+        if resp.will_close or self.pool.full(): conn.close()
+        else: self.pool.put_nowait((conn, time.time()))
+        return resp.status, body
+
+class RegistryCache:
+    """
+    registry answers from ip.bczs.net, stored against the allocated block they
+    describe and resolved for later ips by longest prefix match, entries older
+    than ttl seconds are queried again
+    """
+    def __init__(self, path, base_url="http://ip.bczs.net", ttl=30*24*3600, pool_size=16, timeout=10,
+                 n_retry=3, backoff=1):
+        self.path, self.ttl = path, ttl
+        self.n_retry, self.backoff = n_retry, backoff
+        self.pool = ConnectionPool(base_url, size=pool_size, timeout=timeout)
+        self.tree = RadixTree()
+        self.lock = threading.Lock()
+        self.n_hit = self.n_query = 0
+        if path is not None and path.exists():
+            for network, (name, descr, fetched) in json.load(open(path, "r")).items():
+                self.tree.insert(network, (name, descr, fetched))
+
+    def lookup(self, ip_addr):
+        with self.lock: result = self.tree.lookup(ip_addr)
+        if result is None: return None
+        name, descr, fetched = result[1]
+        return (name, descr) if time.time() - fetched <= self.ttl else None
+
+    def fetch(self, ip_addr): # page of a 200 answer naming the block, retried on 429 / 5xx, RegistryError otherwise
+        for i in range(self.n_retry + 1):
+            with metrics.timer("registry_http"):
+                status, text = self.pool.get(f"/{ip_addr}")
+            if status == 200:
+                if rx0.search(text) or rx1.search(text): return text
+                raise RegistryError(f"{ip_addr}: no registry info in the answer")
+            metrics.inc("registry_errors")
+            if status != 429 and status < 500: break
+            if i < self.n_retry: time.sleep(self.backoff * 2**i)
+        raise RegistryError(f"{ip_addr}: HTTP {status}")
+
+    def query(self, ip_addr):
+        info = self.lookup(ip_addr)
+        if info is not None:
+            self.n_hit += 1
+            metrics.inc("registry_hits")
+            return info
+        self.n_query += 1
+        metrics.inc("registry_queries")
+        text = self.fetch(ip_addr)
+        info = parse_info(text)
+        with self.lock:
+            for network in parse_block(text, ip_addr):
+                self.tree.insert(network, (*info, time.time()))
+        return info
+
+    def save(self):
+        if self.path is None: return
+        with self.lock:
+            data = {str(network): list(value) for network, value in self.tree.items()}
+        json.dump(data, open(self.path, "w"))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : batched rendering of large topologies
+# * Last change   : 08:23:59 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import LogNorm
+
+MAX_LINES = 200000 # above this many edges "auto" rasterizes them into a density image
+
+def ip_colors(ips): # uint32 array -> rgb of the first three bytes
+    ips = np.asarray(ips, dtype=np.uint32)
+    return np.stack([(ips >> 24) & 0xff, (ips >> 16) & 0xff, (ips >> 8) & 0xff], axis=1) / 255.0
+
+def node_sizes(degrees, max_size=100):
+    degrees = np.asarray(degrees, dtype=float)
+    return degrees / max(degrees.max(), 1) * max_size
+
+def edge_segments(pos, edges): # pos: (n, 2) coordinates, edges: (m, 2) row indices into pos
+    return np.asarray(pos)[np.asarray(edges)]
+
+def draw_edges(ax, segments, lod="auto", max_lines=MAX_LINES, bins=1024, n_sample=16, chunk=65536,
+               lw=0.1, alpha=0.6, color="gainsboro", cmap="Greys", zorder=-1):
+    """
+    segments: (m, 2, 2) edge end points
+    lod: "lines" draws every edge in one LineCollection, "density" rasterizes
+         n_sample points along each edge into a bins x bins image, `chunk`
+         edges at a time, "auto" picks by the number of edges against max_lines
+    """
+    if lod == "auto": lod = "lines" if len(segments) <= max_lines else "density"
+    if lod == "lines":
+        ax.add_collection(LineCollection(segments, linewidths=lw, alpha=alpha, colors=color, zorder=zorder))
+        ax.autoscale_view()
+        return
+    if not len(segments): return
+    t = np.linspace(0, 1, n_sample, dtype=np.float32)[None, :, None]
+    lo, hi = segments.min(axis=(0, 1)), segments.max(axis=(0, 1))
+    extent = [[lo[0], hi[0]], [lo[1], hi[1]]]
+    h = np.zeros((bins, bins))
+    for i in range(0, len(segments), chunk): # NOTE: m x n_sample points at once would not fit at millions of edges
+        s = segments[i:i+chunk]
+        pts = (s[:, :1] * (1-t) + s[:, 1:] * t).reshape(-1, 2)
+        h += np.histogram2d(pts[:, 0], pts[:, 1], bins=bins, range=extent)[0]
+    xe, ye = np.linspace(lo[0], hi[0], bins+1), np.linspace(lo[1], hi[1], bins+1)
+    ax.imshow(np.ma.masked_equal(h.T, 0), origin="lower", extent=[xe[0], xe[-1], ye[0], ye[-1]],
+              cmap=cmap, norm=LogNorm(), alpha=alpha, aspect="auto", interpolation="nearest", zorder=zorder)
+
+def draw_nodes(ax, pos, sizes, colors, marker=".", zorder=1):
+    pos = np.asarray(pos)
+    ax.scatter(pos[:, 0], pos[:, 1], c=colors, s=sizes, marker=marker, lw=0, alpha=1, zorder=zorder)
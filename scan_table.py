@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : columnar table of scan results, streaming counts
+# * Last change   : 08:24:24 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import csv
+import json
+import threading
+
+# NOTE: detail keys kept as columns, others (port lines, warnings...) are dropped
+FIELDS = ["Not shown", "Device type", "Running", "Running (JUST GUESSING)", "OS CPE", "OS details",
+          "Aggressive OS guesses", "Network Distance", "Service Info"]
+COLUMNS = ["prefix", "ip"] + FIELDS
+
+class ScanTableWriter: # append scan details as csv rows, thread safe, usable as scan_pipeline's on_detail
+    def __init__(self, path):
+        new = not path.exists() or path.stat().st_size == 0
+        self.file = open(path, "a", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=COLUMNS, extrasaction="ignore")
+        if new: self.writer.writeheader()
+        self.lock = threading.Lock()
+        self.n_row = 0
+
+    def __call__(self, prefix, detail):
+        with self.lock:
+            self.writer.writerow(dict(detail, prefix=str(prefix)))
+            self.file.flush()
+            self.n_row += 1
+
+    def close(self):
+        self.file.close()
+
+def json_to_table(json_path, table_path): # the old {prefix: [detail, ...]} json -> table
+    tmp_path = table_path.with_name(table_path.name + ".tmp") # renamed once complete, as the scan does
+    tmp_path.unlink(missing_ok=True)
+    writer = ScanTableWriter(tmp_path)
+    for p, details in json.load(open(json_path, "r")).items():
+        for detail in details: writer(p, detail)
+    writer.close()
+    tmp_path.rename(table_path)
+    return writer.n_row
+
+def read_table(path, chunksize=100000): # DataFrame chunks, missing fields as ""
+    import pandas as pd
+    yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+
+def _service_info(info, key): # value of `key: value` in "OS: Linux; Device: router; CPE: ..."
+    return info.str.extract(rf"(?:^|; ){key}: ([^;]*)", expand=False)
+
+def normalize(df):
+    """
+    vectorized OS & device normalization of a chunk of the table:
+    OS from the service info, anything with linux in it is Linux, without
+    one the first aggressive guess, Windows for any windows guess, its
+    first word otherwise; devices from the service info and every `|`
+    separated device type, ASUS spelled Asus
+    returns (OS per host, NaN when unknown; long DataFrame of prefix, device)
+    """
+    import numpy as np
+    import pandas as pd
+    os_ = _service_info(df["Service Info"], "OS")
+    os_ = os_.mask(os_.str.contains("linux", na=False, regex=False), "Linux")
+    guess = df["Aggressive OS guesses"].str.split(", ", n=1).str[0]
+    guess = pd.Series(np.where(guess.str.contains("Windows", regex=False), "Windows", guess.str.split(" ", n=1).str[0]), index=df.index)
+    os_ = os_.fillna(guess.mask(df["Aggressive OS guesses"] == "")).replace("ASUS", "Asus")
+
+    device = pd.DataFrame({"prefix": df["prefix"], "Device": _service_info(df["Service Info"], "Device")})
+    device_type = pd.DataFrame({"prefix": df["prefix"], "Device": df["Device type"].str.split("|")}).explode("Device")
+    device = pd.concat([device.dropna(), device_type[device_type["Device"] != ""]], ignore_index=True)
+    device["Device"] = device["Device"].replace("ASUS", "Asus")
+    return os_, device
+
+class ScanCounter:
+    """
+    counts of hosts, OS and devices per prefix, updated one table chunk at
+    a time so that only the counts are kept, never every host
+    """
+    def __init__(self):
+        self.n_host = None
+        self.counts = {"OS": None, "Device": None} # Series indexed by (prefix, value)
+
+    @staticmethod
+    def _add(total, new):
+        return new if total is None else total.add(new, fill_value=0).astype(int)
+
+    def update(self, df):
+        import pandas as pd
+        os_, device = normalize(df)
+        self.n_host = self._add(self.n_host, df.groupby("prefix").size())
+        self.counts["OS"] = self._add(self.counts["OS"], pd.DataFrame({"prefix": df["prefix"], "OS": os_}).dropna().groupby(["prefix", "OS"]).size())
+        self.counts["Device"] = self._add(self.counts["Device"], device.groupby(["prefix", "Device"]).size())
+        return self
+
+    def drop(self, prefix):
+        if self.n_host is None: return
+        self.n_host = self.n_host.drop(prefix, errors="ignore")
+        for k, v in self.counts.items():
+            self.counts[k] = v.drop(prefix, level=0, errors="ignore")
+
+    def totals(self, field): # counts over all prefixes, most common first
+        return self.counts[field].groupby(level=1).sum().sort_values(ascending=False, kind="stable")
+
+    def to_dict(self): # {prefix: {"OS": {name: count}, "Device": {...}}}, as tsinghua.item_count
+        if self.n_host is None: return {}
+        return {p: {k: v.xs(p, level=0).to_dict() if p in v.index.get_level_values(0) else {} for k, v in self.counts.items()}
+                for p in self.n_host.index}
+
+def count_table(path, chunksize=100000):
+    counter = ScanCounter()
+    for df in read_table(path, chunksize=chunksize): counter.update(df)
+    return counter
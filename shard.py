@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : sharded discovery over worker processes, mergeable results
+# * Last change   : 07:38:21 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import os
+import sys
+import json
+import zlib
+import subprocess
+import ipaddress as ipa
+from pathlib import Path
+
+import click
+
+from trace_stream import iter_stream, read_traces
+
+traces_cli = Path(__file__).resolve().parent / "traces.py"
+
+def shard_of(target, n_shard): # stable across processes & hosts, unlike hash()
+    return zlib.crc32(str(target).encode()) % n_shard
+
+def shard_filter(index, n_shard):
+    return lambda target: shard_of(target, n_shard) == index
+
+def parse_shard(text): # "i/n" -> (i, n)
+    index, n_shard = map(int, text.split("/"))
+    assert 0 <= index < n_shard, f"bad shard {text}"
+    return index, n_shard
+
+def shard_dir(output_dir, index, n_shard):
+    return output_dir / "shards" / f"{index}-of-{n_shard}"
+
+def shard_dirs(output_dir):
+    return sorted((output_dir / "shards").glob("*-of-*"), key=lambda d: tuple(map(int, d.name.split("-of-"))))
+
+def partial_peer_map(streams): # {node: set of peers} of some traces, see topology_discovery.get_peer_map
+    peer_map = {}
+    for path in streams:
+        for trace in read_traces(path):
+            route = trace["route"]
+            for a, b in zip(route[:-1], route[1:]):
+                peer_map.setdefault(a, set()).add(b)
+                peer_map.setdefault(b, set()).add(a)
+    return peer_map
+
+def save_peer_map(peer_map, path): # sorted, so equal maps give equal files
+    tmp = Path(f"{path}.tmp")
+    json.dump({k: sorted(peer_map[k], key=ipa.IPv4Address) for k in sorted(peer_map, key=ipa.IPv4Address)}, open(tmp, "w"))
+    os.replace(tmp, path)
+
+def load_peer_map(path):
+    return {k: set(v) for k, v in json.load(open(path, "r")).items()}
+
+def finish_shard(directory): # called by a worker once its targets are traced
+    save_peer_map(partial_peer_map(sorted(directory.glob("trace_*.jsonl"))), directory / "peers.json")
+
+def merge_streams(paths, output_path):
+    """
+    merge streams of one prefix, the newest record of each target wins, ties
+    go to the later path, records are written in target order so the result
+    only depends on the records, not on which worker traced what
+    """
+    latest = {}
+    for path in paths:
+        for trace in iter_stream(path):
+            t, old = trace["target"], latest.get(trace["target"])
+            if old is None or trace.get("time", 0) >= old.get("time", 0):
+                latest[t] = trace
+    tmp = Path(f"{output_path}.tmp")
+    with open(tmp, "w") as f:
+        for t in sorted(latest, key=ipa.IPv4Address):
+            f.write(json.dumps(latest[t], sort_keys=True) + "\n")
+    os.replace(tmp, output_path)
+    return len(latest)
+
+def merge_shards(output_dir):
+    """
+    merge the streams of every shard into the prefix streams of output_dir
+    (the ones already there included, so merging again is a no-op), and the
+    partial peer maps of the workers into output_dir/peers.json
+    returns the merged peer map
+    """
+    dirs = shard_dirs(output_dir)
+    names = sorted({path.name for d in dirs for path in d.glob("trace_*.jsonl")})
+    for name in names:
+        paths = [output_dir / name] if (output_dir / name).exists() else []
+        merge_streams(paths + [d / name for d in dirs if (d / name).exists()], output_dir / name)
+
+    peer_map = {}
+    for d in dirs:
+        if not (d / "peers.json").exists():
+            print(f"no peer map in {d}, worker not finished?")
+            continue
+        for k, v in load_peer_map(d / "peers.json").items():
+            peer_map.setdefault(k, set()).update(v)
+    save_peer_map(peer_map, output_dir / "peers.json")
+    print(f"merged {len(names)} prefix streams of {len(dirs)} shards, "
+          f"{len(peer_map)} nodes, {sum(map(len, peer_map.values())) // 2} links")
+    return peer_map
+
+@click.group()
+def main():
+    """
+    shard /24 targets over worker processes by a hash of the target
+
+    \b
+    on one machine:  shard.py run -p 10.0.0.0/16 -w 4
+    across hosts sharing output-dir:
+      host i:        traces.py -p 10.0.0.0/16 -o DIR --shard i/N
+      then:          shard.py merge -o DIR
+    """
+
+@main.command()
+@click.option("--prefix", "-p", multiple=True, help="ip prefix to discovery, e.g. 192.168.0.0/16")
+@click.option("--output-dir", "-o", type=Path, default=Path("./output"), help="file path to save traces output")
+@click.option("--n-worker", "-w", type=int, default=os.cpu_count(), help="number of worker processes")
+@click.option("--n-concurrency", "-c", type=int, default=256, help="max number of traceroute running at once for one worker")
+@click.option("--n-per-prefix", "-n", type=int, default=64, help="max number of traceroute running at once for one prefix of one worker")
+@click.option("--doubletree", is_flag=True, help="skip hops already discovered with doubletree stop sets")
+@click.option("--adaptive", is_flag=True, help="adjust concurrency at runtime from timeouts and losses")
+def run(prefix, output_dir, n_worker, n_concurrency, n_per_prefix, doubletree, adaptive):
+    output_dir = output_dir.resolve()
+    cmd = [sys.executable, str(traces_cli), "-o", str(output_dir), "-c", str(n_concurrency), "-n", str(n_per_prefix)]
+    cmd += [arg for p in prefix for arg in ("-p", p)]
+    if doubletree: cmd.append("--doubletree")
+    if adaptive: cmd.append("--adaptive")
+    workers = [subprocess.Popen(cmd + ["--shard", f"{i}/{n_worker}"]) for i in range(n_worker)]
+    failed = [i for i, w in enumerate(workers) if w.wait() != 0]
+    if failed: raise click.ClickException(f"shards {failed} failed, run again to resume them")
+    merge_shards(output_dir)
+
+@main.command()
+@click.option("--output-dir", "-o", type=Path, default=Path("./output"), help="directory shared by the workers")
+def merge(output_dir):
+    merge_shards(output_dir.resolve())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : virtual /24 subnet expansion behind gateways
+# * Last change   : 07:26:42 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+from collections import namedtuple
+
+import numpy as np
+
+from graph_build import csr_degree, csr_edges
+from ip_array import uint32_to_ip
+
+N_HOST = 253 # x.x.x.2 - x.x.x.254 behind the gateway x.x.x.1
+
+# every x.x.x.1 node stands for a link to each host of its /24, kept as one range
+#   gateways: node index of the gateway, hosts are [nodes[gateway]+1, nodes[gateway]+1+N_HOST)
+#   lo, hi: real nodes inside the range are nodes[lo:hi]
+#   linked: real nodes inside the range already adjacent to the gateway
+SubnetExpansion = namedtuple("SubnetExpansion", ["gateways", "lo", "hi", "linked"])
+
+def _ranges(lo, hi): # concatenation of arange(lo[i], hi[i])
+    counts = hi - lo
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+
+def expand_subnets(g):
+    gateways = np.flatnonzero((g.nodes & 0xff) == 1)
+    start = g.nodes[gateways].astype(np.int64) + 1
+    lo = np.searchsorted(g.nodes, start)
+    hi = np.searchsorted(g.nodes, start + N_HOST)
+
+    # real hosts inside each range, checked against the edge list in one pass
+    owner, hosts = np.repeat(gateways, hi - lo), _ranges(lo, hi)
+    edges = csr_edges(g)
+    keys = np.sort((edges.min(axis=1) << 32) | edges.max(axis=1))
+    cand = (np.minimum(owner, hosts) << 32) | np.maximum(owner, hosts)
+    linked = np.zeros(len(g.nodes), dtype=bool)
+    if len(keys): linked[hosts[np.isin(cand, keys, assume_unique=False)]] = True
+    return SubnetExpansion(gateways, lo, hi, linked)
+
+def n_virtual(ex): # hosts not already in the graph
+    return int((N_HOST - (ex.hi - ex.lo)).sum())
+
+def expanded_node_count(g, ex):
+    return len(g.nodes) + n_virtual(ex)
+
+def expanded_edge_count(g, ex):
+    return len(csr_edges(g)) + len(ex.gateways) * N_HOST - int(ex.linked.sum())
+
+def expanded_degree(g, ex): # degree of real nodes, every virtual host has degree 1
+    degree = csr_degree(g).copy()
+    n_linked = np.r_[0, np.cumsum(ex.linked)]
+    degree[ex.gateways] += N_HOST - (n_linked[ex.hi] - n_linked[ex.lo])
+    hosts = _ranges(ex.lo, ex.hi)
+    degree[hosts[~ex.linked[hosts]]] += 1
+    return degree
+
+def expanded_degree_map(g, ex):
+    return dict(zip(uint32_to_ip(g.nodes), expanded_degree(g, ex).tolist()))
+
+def virtual_hosts(g, ex, i): # materialize the hosts behind the i-th gateway on demand
+    start = int(g.nodes[ex.gateways[i]]) + 1
+    hosts = np.arange(start, start + N_HOST, dtype=np.uint32)
+    return hosts[~np.isin(hosts, g.nodes[ex.lo[i]:ex.hi[i]])]
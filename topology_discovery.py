@@ -2,68 +2,44 @@
 #-*- coding: utf-8 -*-
 # **********************************************************************
 # * Description   : topology discovery
-# * Last change   : 21:06:03 2020-12-24
+# * Last change   : 08:23:59 2026-10-18
 # * Author        : Yihao Chen
 # * Email         : chenyiha17@mails.tsinghua.edu.cn
 # * License       : www.opensource.org/licenses/bsd-license.php
 # **********************************************************************
 
 import subprocess
-import ipaddress as ipa 
 from concurrent.futures import ThreadPoolExecutor
 from itertools import product
-import re
 
-import networkx as nx
-import matplotlib.pyplot as plt
-from matplotlib.offsetbox import AnchoredText
-import seaborn as sns
-import numpy as np
-import pandas as pd
-from sklearn.manifold import TSNE
+import metrics
+from probe_scheduler import TRACEROUTE_CMD, parse_traceroute, trace_gateways
 
-from tqdm import tqdm
+# NOTE: probing & parsing above only need the stdlib, numpy, networkx, matplotlib,
+# pandas... are imported by the analysis functions below when called, so that
+# probe jobs and CLIs start fast
 
 def trace_route(ip_addr): # NOTE: could raise error
-    cmd = ["traceroute", "-4nI", "-q", "1", "-w", "2", str(ip_addr)]
+    cmd = TRACEROUTE_CMD + [str(ip_addr)]
+    metrics.inc("probes")
     output = subprocess.run(cmd, stdout=subprocess.PIPE, timeout=10)
-    route, delay, reachable = [], [], True
-    for l in output.stdout.decode().strip().split("\n")[1:]:
-        items = l.strip().split()
-        if items[1] == "*":
-            reachable = False
-            break
-        ipa.IPv4Address(items[1])
-        route.append(items[1])
-        delay.append(float(items[2]))
-    return {
-        "target": str(ip_addr),
-        "route": route,
-        "delay": delay,
-        "reachable": reachable,
-    } if route else None
-
-def trace_gateway(prefix): # trace the gateway of each /24 subnet
-    prefix = ipa.IPv4Network(prefix)
-    prefixlen = prefix.prefixlen 
-    assert prefixlen <= 24
-    subnets = prefix.subnets(new_prefix=24)
-
-    def worker(subnet):
-        try: return trace_route(subnet[1])
-        except: return None
-
-    n_worker = min(2**(24-prefix.prefixlen), 256) # one thread for each trace (no more than 256)
-    with ThreadPoolExecutor(max_workers=n_worker) as executor:
-        traces = list(filter(lambda x: x is not None, executor.map(worker, subnets)))
-
-    return traces
+    return parse_traceroute(output.stdout.decode(), ip_addr)
 
+def trace_gateway(prefix, **kwargs): # trace the gateway of each /24 subnet
+    return trace_gateways([prefix], **kwargs)[prefix]
+
+@metrics.timed("peer_map")
 def get_peer_map(traces, peer_map=None):
     if peer_map is None: peer_map = {}
     def create_if_not_exist(node):
         if node not in peer_map:
             peer_map[node] = set()
+    if hasattr(traces, "offsets") and hasattr(traces, "hops"): # vectorized path for the columnar store
+        from graph_build import graph_from_traces, to_peer_map
+        for node, peers in to_peer_map(graph_from_traces(traces)).items():
+            create_if_not_exist(node)
+            peer_map[node] |= peers
+        return peer_map
     for trace in traces:
         route = trace["route"]
         for a, b in zip(route[:-1], route[1:]):
@@ -74,6 +50,7 @@ def get_peer_map(traces, peer_map=None):
     return peer_map
 
 def get_network_graph(peer_map):
+    import networkx as nx
     G = nx.Graph()
     for node, peers in peer_map.items():
         G.add_edges_from(product([node], peers))
@@ -90,75 +67,86 @@ def get_color_for_ip(ip_str):
     return [int(x) for x in ip_str.split(".")][:3]
 
 def get_vec_for_ip(ip_str):
-    return np.array([int(bit) for x in ip_str.split(".") for bit in list(f"{int(x):08b}")])
-
-def drawG(ax, G):
+    from embedding import ip_bits
+    from ip_array import ip_to_uint32
+    return ip_bits(ip_to_uint32([ip_str]))[0]
+
+def _draw_arrays(G): # (node names, (m, 2) edge indices, degrees) of a csr or networkx graph
+    import numpy as np
+    from ip_array import ip_to_uint32, uint32_to_ip
+    from graph_build import csr_degree, csr_edges
+    if hasattr(G, "indptr"): # graph_build.CSRGraph, edges straight from its arrays
+        return uint32_to_ip(G.nodes), csr_edges(G), csr_degree(G)
+    names = list(G.nodes)
+    ips = ip_to_uint32(names)
+    order = np.argsort(ips)
+    ends = ip_to_uint32([n for e in G.edges for n in e])
+    edges = order[np.searchsorted(ips[order], ends)].reshape(-1, 2)
+    return names, edges, np.array([d for _, d in G.degree(names)])
+
+def drawG(ax, G, degree=None, pos=None, lod="auto"):
+    """
+    G: networkx graph or graph_build.CSRGraph
+    degree: {node: degree}, e.g. counting hosts of expanded subnets
+    pos: {node: (x, y)}, spring layout by default, which only suits a few
+         thousand nodes, pass e.g. the embedding for larger graphs
+    """
+    import numpy as np
+    import networkx as nx
+    from ip_array import ip_to_uint32
+    from graph_build import to_networkx
+    from render import draw_edges, draw_nodes, edge_segments, ip_colors, node_sizes
     print("draw G...")
-    nodes, degrees = np.array(list(map(list, G.degree))).T
-    nodes = nodes.astype(str)
-    degrees = degrees.astype(int)
-    node_size = degrees / degrees.max() * 100
-    node_color = np.array([get_color_for_ip(i) for i in nodes]) / 255.0
-    nx.draw(G, ax=ax, node_size=node_size, node_color=node_color, width=0.5, linewidths=None)
-
+    nodes, edges, degrees = _draw_arrays(G)
+    if degree is not None: degrees = np.array([degree[i] for i in nodes])
+    if pos is None: pos = nx.spring_layout(to_networkx(G) if hasattr(G, "indptr") else G)
+    xy = np.array([pos[i] for i in nodes]).reshape(-1, 2)
+    draw_edges(ax, edge_segments(xy, edges), lod=lod, lw=0.5, alpha=1, color="k")
+    draw_nodes(ax, xy, node_sizes(degrees), ip_colors(ip_to_uint32(nodes)), marker="o")
+    ax.set_axis_off()
+
+@metrics.timed("cluster")
 def cluster(G):
-    vecs = list(map(get_vec_for_ip, G.nodes))
-    emb = dict(zip(G.nodes, TSNE(n_components=2, init='pca', n_jobs=8).fit_transform(vecs)))
+    from embedding import tsne
+    from ip_array import ip_to_uint32
+    emb = dict(zip(G.nodes, tsne(ip_to_uint32(G.nodes))))
     return emb
 
-def draw_scatter(ax, G, emb):
+def draw_scatter(ax, G, emb, lod="auto"): # G: networkx graph or graph_build.CSRGraph
+    import numpy as np
+    from ip_array import ip_to_uint32
+    from render import draw_edges, draw_nodes, edge_segments, ip_colors
     print("draw scatter...")
-    for a, b in tqdm(G.edges):
-        xa, ya = emb[a]
-        xb, yb = emb[b]
-        ax.plot([xa, xb], [ya, yb], lw=0.1, alpha=0.6, ls="-", color="gainsboro", zorder=-1)
-
-    x, y = np.array([emb[i] for i in G.nodes]).T
-    colors = np.array([get_color_for_ip(i) for i in G.nodes])
-    c = colors / 255.0
-    ax.scatter(x, y, c=c, s=8, marker=".", lw=0, alpha=1, zorder=1)
+    nodes, edges, _ = _draw_arrays(G)
+    xy = np.array([emb[i] for i in nodes]).reshape(-1, 2)
+    draw_edges(ax, edge_segments(xy, edges), lod=lod)
+    draw_nodes(ax, xy, 8, ip_colors(ip_to_uint32(nodes)))
 
     ax.set_xticks([])
     ax.set_yticks([])
 
-def draw_prefixes(ax, prefixes):
+def draw_prefixes(ax, prefixes): # x axis in /24 subnets, prefixes are kept as [start, end) intervals
+    import numpy as np
+    from matplotlib.offsetbox import AnchoredText
+    from prefix_space import (prefix_intervals, histogram, smooth_density, covered_ranges,
+                              per_slash8, pick_ticks, tick_labels, length_breakdown)
     print("draw prefixes...")
-    def get_value(p, mask=24):
-        base, masklen = p.split("/")
-        base = int(ipa.ip_address(base)) >> (32-mask)
-        return (np.arange(1 << max(0, mask-int(masklen)))+base).tolist()
+    iv = prefix_intervals(prefixes)
 
-    samples = np.array([v for p in prefixes for v in get_value(p, mask=24)])
-    sns.distplot(samples, hist=True, bins=24, kde=True, rug=True, color="darkblue",
-              kde_kws={"linewidth": 3}, rug_kws={"color": "black"}, ax= ax)
+    counts, edges = histogram(iv, bins=24)
+    ax.stairs(counts / counts.sum() / (np.diff(edges) / 256), edges / 256, fill=True, color="darkblue", alpha=0.4)
+    x, density = smooth_density(iv)
+    ax.plot(x / 256, density * 256, color="darkblue", linewidth=3)
+    start, end = covered_ranges(iv) # rug, one bar per covered range
+    ax.broken_barh(list(zip(start / 256, (end - start) / 256)), (0, 0.03), color="black", transform=ax.get_xaxis_transform())
 
     # process xticks
-    x, c = np.unique([v for p in prefixes for v in get_value(p, mask=8)], return_counts=True)
-    xx = []
-    for i in x[np.argsort(c)[::-1]]:
-        check = True
-        for j in xx:
-            if abs(i-j) <= 10:
-                check = False
-                break
-        if check: xx.append(i)
-    x = np.array(xx)
-
-    def get_one_prefix(first_byte):
-        for p in prefixes:
-            if int(p.split(".")[0]) == first_byte:
-                return p
-
-    xticks_label = [get_one_prefix(int(i)) for i in x]
-    xticks = (x << 16)
-    ax.set_xticks(xticks)
-    ax.set_xticklabels(xticks_label, rotation=30)
+    x = pick_ticks(per_slash8(iv), min_gap=10)
+    ax.set_xticks(x << 16)
+    ax.set_xticklabels(tick_labels(prefixes, iv, x), rotation=30)
 
     # process txt
-    l, c = np.unique([int(p.split("/")[1]) for p in prefixes], return_counts=True)
-    idx = np.argsort(c)[::-1]
-    l = l[idx]
-    c = c[idx]
+    l, c = length_breakdown(iv)
     total = c.sum()
     txt = f"{'count':>9s}{'ratio':>8s}\n"
     txt += "\n".join([rf"/{k}:{v:>5d}{f'{v/total:.2%}':>8s}"for k,v in zip(l, c)])
@@ -169,34 +157,52 @@ def draw_prefixes(ax, prefixes):
     ax.set_xlabel("")
     ax.set_ylabel("density")
 
-def query_node_info(G):
-    nodes, degrees = np.array(list(map(list, G.degree))).T
-    nodes = nodes.astype(str)
-    degrees = degrees.astype(int)
-    idx = np.argsort(degrees)[::-1]
-    nodes = nodes[idx]
-    degrees = degrees[idx]
-
-    rx0 = re.compile(r"IP段名称：([a-zA-Z0-9-_]+?)<br>")
-    rx1 = re.compile(r"IP段描述：([\s\S]+?)<br/>")
-    def get_info(ip):
-        target = f"http://ip.bczs.net/{ip}"
-        text = subprocess.check_output(["curl", "-s", target], timeout=10).decode()
-        result = rx0.search(text)
-        r0 = result.group(1).replace("\n", " ").strip() if result else ""
-        result = rx1.search(text)
-        r1 = result.group(1).replace("\n", " ").strip() if result else ""
-        return r0, r1
-
-    n_worker = min(len(nodes), 256)
-    with ThreadPoolExecutor(max_workers=n_worker) as executor:
-        info = list(executor.map(get_info, nodes))
-    names, descrs = np.array(info).T
-    df = pd.DataFrame.from_dict({"node": nodes, "name": names, "degrees": degrees, "descr": descrs})
-    return df
+@metrics.timed("query_node_info")
+def query_node_info(G, registry=None, ranking=None):
+    """
+    registry info of every node, most central first: in the order of
+    ranking (a graph_analytics.rank_nodes table, whose columns are kept)
+    when given, by degree in G otherwise
+    """
+    import numpy as np
+    import pandas as pd
+    from registry import RegistryCache
+    if ranking is None:
+        nodes, degrees = np.array(list(map(list, G.degree))).T
+        idx = np.argsort(degrees.astype(int))[::-1]
+        ranking = pd.DataFrame({"node": nodes[idx].astype(str), "degree": degrees[idx].astype(int)})
+    nodes = ranking["node"].to_numpy()
+
+    if registry is None: registry = RegistryCache(None)
+    # nodes of one /16 are queried in turn, so that a block answer serves the rest from cache
+    groups = {}
+    for i, ip in enumerate(nodes): groups.setdefault(ip.rsplit(".", 2)[0], []).append(i)
+    info = [None] * len(nodes)
+    def worker(group):
+        for i in group:
+            try: info[i] = registry.query(nodes[i])
+            except Exception as e: # NOTE: left empty and uncached, queried again next run
+                print(e)
+                info[i] = ("", "")
+
+    n_worker = max(min(len(groups), 16), 1)
+    try:
+        with ThreadPoolExecutor(max_workers=n_worker) as executor:
+            list(executor.map(worker, groups.values()))
+    finally:
+        registry.save()
+    print(f"registry: {registry.n_query} queries, {registry.n_hit} cache hits")
+    names, descrs = np.array(info).reshape(-1, 2).T
+    df = ranking.rename(columns={"degree": "degrees"}).assign(name=names, descr=descrs)
+    return df[["node", "name", "degrees", "descr"] + [c for c in df.columns if c not in ("node", "name", "degrees", "descr")]]
 
 def save_node_info_table(df_node_info):
-    df_agg = df_node_info.groupby(["name", "descr"]).agg({"degrees": ["count", "max"]})
-    df_agg.columns = ["instances", "degree_max"]
-    df_agg = df_agg.reset_index().sort_values(by=["degree_max", "instances"], ascending=False, ignore_index=True)
+    agg = {"instances": ("degrees", "count"), "degree_max": ("degrees", "max")}
+    if "betweenness" in df_node_info: # ranked by graph_analytics.rank_nodes
+        agg.update(core_max=("core", "max"), betweenness_max=("betweenness", "max"), betweenness_sum=("betweenness", "sum"))
+        by = ["betweenness_sum", "degree_max", "instances"]
+    else:
+        by = ["degree_max", "instances"]
+    df_agg = df_node_info.groupby(["name", "descr"]).agg(**agg)
+    df_agg = df_agg.reset_index().sort_values(by=by, ascending=False, ignore_index=True)
     df_agg.to_html("node_info.html")
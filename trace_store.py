@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : memory-mapped columnar trace store
+# * Last change   : 07:35:28 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import os
+import json
+import socket
+from array import array
+from pathlib import Path
+from collections import namedtuple
+
+import numpy as np
+
+import metrics
+from ip_array import uint32_to_ip
+from trace_stream import read_traces
+
+# hops & delays of trace i are hops[offsets[i]:offsets[i+1]]
+TraceStore = namedtuple("TraceStore", ["targets", "offsets", "hops", "delays", "reachable"])
+
+def _sources(files):
+    return {str(f): [os.stat(f).st_size, os.stat(f).st_mtime] for f in sorted(map(str, files))}
+
+def _aton(ip_str):
+    return int.from_bytes(socket.inet_aton(ip_str), "big")
+
+@metrics.timed("trace_store_build")
+def build_trace_store(files, store_dir):
+    store_dir = Path(store_dir)
+    store_dir.mkdir(exist_ok=True, parents=True)
+    sources = _sources(files)
+
+    targets, offsets, hops, delays, reachable = array("I"), array("q", [0]), array("I"), array("f"), array("b")
+    for f in sources:
+        for trace in read_traces(f):
+            targets.append(_aton(trace["target"]))
+            hops.extend(map(_aton, trace["route"]))
+            delays.extend(trace["delay"])
+            reachable.append(trace["reachable"])
+            offsets.append(len(hops))
+
+    columns = {
+        "targets": np.frombuffer(targets, dtype=np.uint32),
+        "offsets": np.frombuffer(offsets, dtype=np.int64),
+        "hops": np.frombuffer(hops, dtype=np.uint32),
+        "delays": np.frombuffer(delays, dtype=np.float32),
+        "reachable": np.frombuffer(reachable, dtype=np.int8).astype(bool),
+    }
+    for k, v in columns.items(): # write to temp file first, a half written store is never loaded
+        with open(store_dir / f"{k}.npy.tmp", "wb") as fp: np.save(fp, v)
+        os.replace(store_dir / f"{k}.npy.tmp", store_dir / f"{k}.npy")
+    json.dump(sources, open(store_dir / "sources.json", "w"))
+
+def load_trace_store(store_dir):
+    store_dir = Path(store_dir)
+    return TraceStore(*[np.load(store_dir / f"{k}.npy", mmap_mode="r") for k in TraceStore._fields])
+
+def get_trace_store(files, store_dir): # build once, rebuild only when a source file changed
+    sources_path = Path(store_dir) / "sources.json"
+    if not sources_path.exists() or json.load(open(sources_path, "r")) != _sources(files):
+        build_trace_store(files, store_dir)
+    return load_trace_store(store_dir)
+
+def store_edges(store): # consecutive hop pairs within each trace, (n, 2) uint32
+    hops, offsets = store.hops, np.asarray(store.offsets)
+    if len(hops) < 2: return np.empty((0, 2), dtype=np.uint32)
+    keep = np.ones(len(hops)-1, dtype=bool)
+    ends = offsets[1:-1]
+    ends = ends[(ends > 0) & (ends < len(hops))]
+    keep[ends-1] = False
+    return np.stack([hops[:-1][keep], hops[1:][keep]], axis=1)
+
+def iter_store(store): # back to the dicts trace_route returns
+    offsets = np.asarray(store.offsets)
+    targets = uint32_to_ip(store.targets)
+    for i, target in enumerate(targets):
+        a, b = offsets[i], offsets[i+1]
+        yield {
+            "target": target,
+            "route": uint32_to_ip(store.hops[a:b]),
+            "delay": store.delays[a:b].tolist(),
+            "reachable": bool(store.reachable[i]),
+        }
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : append-only trace streams with resume
+# * Last change   : 07:50:36 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import json
+import time
+
+import metrics
+from probe_scheduler import gateway_targets, trace_targets
+
+def stream_path(output_dir, prefix):
+    return output_dir / f"trace_{prefix.replace('/', '-')}.jsonl"
+
+def legacy_path(output_dir, prefix): # json list written once the prefix finished
+    return output_dir / f"trace_{prefix.replace('/', '-')}"
+
+def repair_stream(path): # drop a line torn by a crash so later appends stay parsable
+    if not path.exists(): return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+def append_trace(path, target, trace):
+    if trace is None: # keep a record so that the target is not probed again
+        trace = {"target": str(target), "route": [], "delay": [], "reachable": False}
+    line = json.dumps(dict(trace, time=time.time())) + "\n"
+    with open(path, "a") as f:
+        f.write(line)
+    metrics.inc("trace_bytes_written", len(line))
+
+def iter_stream(path):
+    with open(path, "r") as f:
+        for l in f:
+            try: yield json.loads(l)
+            except json.JSONDecodeError: continue # torn line
+
+def latest_traces(path): # a refreshed target appears again later in the stream, the last record wins
+    return {trace["target"]: trace for trace in iter_stream(path)}
+
+def read_traces(path, with_empty=False):
+    path = str(path)
+    traces = latest_traces(path).values() if path.endswith(".jsonl") else json.load(open(path, "r"))
+    for trace in traces:
+        if with_empty or trace["route"]:
+            yield trace
+
+def traced_targets(path):
+    if not path.exists(): return set()
+    return {trace["target"] for trace in read_traces(path, with_empty=True)}
+
+def missing_targets(output_dir, prefix, select=None, targets=None):
+    if legacy_path(output_dir, prefix).exists(): return []
+    done = traced_targets(stream_path(output_dir, prefix))
+    if targets is None: targets = gateway_targets(prefix)
+    return [t for t in targets if str(t) not in done and (select is None or select(t))]
+
+def stream_gateways(prefixes, output_dir, on_trace=None, select=None, prober=None, targets=None, **kwargs):
+    """
+    trace the gateway of each /24 subnet for all prefixes, appending every
+    trace to its prefix stream as soon as it completes, targets already in
+    the streams are skipped, returns the number of targets traced
+    select(target): only trace targets it returns True for, e.g. one shard
+    prober: traces all targets at once instead of the scheduler, e.g. YarrpProber
+    targets: {prefix: [target, ...]} instead of every gateway of the prefixes,
+        e.g. the deduplicated targets of prefix_plan.plan_prefixes
+    """
+    planned, targets = targets, {}
+    for p in (planned if planned is not None else prefixes):
+        repair_stream(stream_path(output_dir, p))
+        missing = missing_targets(output_dir, p, select=select, targets=planned[p] if planned is not None else None)
+        if missing: targets[p] = missing
+
+    def save_trace(p, target, trace):
+        append_trace(stream_path(output_dir, p), target, trace)
+        if on_trace: on_trace(p, target, trace)
+    (prober.trace_targets if prober else trace_targets)(targets, on_trace=save_trace, **kwargs)
+    return sum(map(len, targets.values()))
@@ -2,29 +2,66 @@
 #-*- coding: utf-8 -*-
 # **********************************************************************
 # * Description   : get traces for ip prefix
-# * Last change   : 19:52:01 2020-12-06
+# * Last change   : 08:21:47 2026-10-18
 # * Author        : Yihao Chen
 # * Email         : chenyiha17@mails.tsinghua.edu.cn
 # * License       : www.opensource.org/licenses/bsd-license.php
 # **********************************************************************
 
 import click
-import json
 from pathlib import Path
-from topology_discovery import trace_gateway
+from trace_stream import stream_gateways
+from doubletree import DoubleTree
+from probe_scheduler import probe_controls
+from rediscovery import refresh_diff
+from shard import parse_shard, shard_filter, shard_dir, finish_shard
+from yarrp import YarrpProber
+from prefix_plan import plan_prefixes, report_plan
 
 @click.command()
 @click.option("--prefix", "-p", multiple=True, help="ip prefix to discovery, e.g. 192.168.0.0/16")
 @click.option("--output-dir", "-o", type=Path, default=Path("./output"), help="file path to save traces output")
-def main(prefix, output_dir, **kwargs):
+@click.option("--n-concurrency", "-c", type=int, default=256, help="max number of traceroute running at once")
+@click.option("--n-per-prefix", "-n", type=int, default=64, help="max number of traceroute running at once for one prefix")
+@click.option("--doubletree", is_flag=True, help="skip hops near the monitor already discovered, doubletree global stop set")
+@click.option("--start-ttl", type=int, default=8, help="ttl to start doubletree probing from")
+@click.option("--adaptive", is_flag=True, help="adjust concurrency at runtime from timeouts and losses")
+@click.option("--ttl", type=float, default=None, help="re-probe targets traced more than this many hours ago")
+@click.option("--yarrp", is_flag=True, help="send all ttl probes from this process over a raw socket (needs root)")
+@click.option("--rate", type=int, default=10000, help="probes per second with --yarrp")
+@click.option("--max-ttl", type=int, default=16, help="largest ttl probed with --yarrp")
+@click.option("--shard", type=parse_shard, default=None, help="i/n, only trace targets of shard i out of n, see shard.py")
+def main(prefix, output_dir, n_concurrency, n_per_prefix, doubletree, start_ttl, adaptive, ttl, yarrp, rate, max_ttl, shard, **kwargs):
     output_dir = output_dir.resolve()
+    if shard:
+        output_dir = shard_dir(output_dir, *shard)
+        kwargs["select"] = shard_filter(*shard)
     if not output_dir.exists(): print(f"create output dir: {output_dir}")
     output_dir.mkdir(exist_ok=True, parents=True)
 
-    for p in prefix:
-        print(f"getting traces for {p}...")
-        trace_path = output_dir / f"trace_{p.replace('/', '-')}"
-        json.dump(trace_gateway(p), open(trace_path, "w"))
+    if doubletree:
+        dt = DoubleTree(start_ttl=start_ttl)
+        kwargs["tracer"] = dt.trace
+    if adaptive: kwargs.update(probe_controls(n_concurrency, n_per_prefix))
+    if yarrp: kwargs["prober"] = YarrpProber(max_ttl=max_ttl, rate=rate)
+    plan = plan_prefixes(prefix) # overlapping prefixes share their targets
+    report_plan(plan)
+
+    if ttl is not None:
+        assert not shard, "refresh the merged traces instead of one shard"
+        assert not yarrp, "refresh verifies routes with traceroute, without --yarrp"
+        print(f"refreshing traces for {', '.join(prefix)}...")
+        stats, _ = refresh_diff(list(plan.targets), output_dir, ttl * 3600, targets=plan.targets,
+                n_concurrency=n_concurrency, n_per_prefix=n_per_prefix, **kwargs)
+        print(f"{stats['unchanged']} routes unchanged, {stats['changed']} changed, {stats['new']} new")
+        return
+
+    print(f"getting traces for {', '.join(prefix)}...")
+    n_traced = stream_gateways(list(plan.targets), output_dir, targets=plan.targets, on_prefix_done=lambda p: print(f"finished {p}"),
+            n_concurrency=n_concurrency, n_per_prefix=n_per_prefix, **kwargs)
+    print(f"{n_traced} targets traced")
+    if shard: finish_shard(output_dir)
+    if doubletree: print(f"doubletree: {dt.n_process} traceroute processes, {dt.n_probe} hops probed for {dt.n_hop} hops, {dt.n_saved} saved")
 
 if __name__ == "__main__":
     main()
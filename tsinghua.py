@@ -2,7 +2,7 @@
 #-*- coding: utf-8 -*-
 # **********************************************************************
 # * Description   : ip asset scanning for Tsinghua
-# * Last change   : 14:45:52 2020-12-20
+# * Last change   : 08:25:11 2026-10-18
 # * Author        : Yihao Chen
 # * Email         : chenyiha17@mails.tsinghua.edu.cn
 # * License       : www.opensource.org/licenses/bsd-license.php
@@ -11,12 +11,11 @@
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 from ip_scan import *
-import json
+from scan_table import COLUMNS, ScanTableWriter, ScanCounter, json_to_table, count_table
 import time
+import json
 import ipaddress as ipa
-
-import matplotlib.pyplot as plt
-import numpy as np
+import metrics
 
 def current_date():
     return time.strftime("%Y-%m-%d", time.localtime())
@@ -57,50 +56,21 @@ def scan_ip_detail(active_ip):
         detail_ip[k] = list(details)
     return detail_ip
 
-def item_count(detail_ip):
-    counts = {}
-
-    def get_dict(line):
-        return dict([i.split(": ") for i in line.split("; ")])
-
-    def update(d, i):
-        if i == "ASUS": i = "Asus"
-        if i not in d:
-            d[i] = 1
-        else:
-            d[i] += 1
-
-    for k, v in detail_ip.items():
-        counts[k] = {"OS": dict(), "Device": dict()}
-        for item in v:
-            if "Service Info" in item:
-                item.update(get_dict(item["Service Info"]))
-            if "OS" in item:
-                if "linux" in item["OS"]:
-                    item["OS"] = "Linux"
-            elif "Aggressive OS guesses" in item:
-                target = item["Aggressive OS guesses"].split(", ")[0]
-                if "Windows" in target:
-                    item["OS"] = "Windows"
-                else:
-                    item["OS"] = target.split(" ")[0]
-            if "OS" in item: update(counts[k]["OS"], item["OS"])
-            if "Device" in item:
-                update(counts[k]["Device"], item["Device"])
-            if "Device type" in item:
-                item["Device type"] = item["Device type"].split("|")
-                for dt in item["Device type"]:
-                    update(counts[k]["Device"], dt)
-    return counts
-
-def draw_active_ip(detail_ip):
+def item_count(detail_ip): # {prefix: [detail, ...]} -> {prefix: {"OS": {name: count}, "Device": {...}}}
+    import pandas as pd
+    df = pd.DataFrame([dict(d, prefix=p) for p, v in detail_ip.items() for d in v], columns=COLUMNS).fillna("")
+    return ScanCounter().update(df).to_dict()
+
+def draw_active_ip(n_active): # n_active: {prefix: number of live hosts}
+    import matplotlib.pyplot as plt
+    import numpy as np
     plt.clf()
     plt.figure(figsize=(12, 6))
 
     columns = list(map(str, sorted(tsinghua_prefixes, key=lambda x: x.num_addresses)))[::-1]
     rows = ["all", "inactive", "active"]
 
-    y_active = np.array([len(detail_ip[i]) for i in columns])
+    y_active = np.array([n_active.get(i, 0) for i in columns])
     y_all = np.sort([i.num_addresses for i in tsinghua_prefixes])[::-1]
     y_inactive = y_all - y_active
     data = np.array([y_active, y_inactive-y_active, y_all-y_inactive])
@@ -134,26 +104,12 @@ def draw_active_ip(detail_ip):
     plt.savefig("active_ip.pdf", bbox_inches="tight")
     plt.savefig("active_ip.png", bbox_inches="tight")
 
-def draw_item_counts(item_counts):
-    os_count, device_count = {}, {}
-    for v in item_counts.values():
-        for a,b in v["OS"].items():
-            if a in os_count: os_count[a] += b
-            else: os_count[a] = b
-        for a,b in v["Device"].items():
-            if a in device_count: device_count[a] += b
-            else: device_count[a] = b
-
-    def sort_count(c):
-        name, cnt = np.array(list(c.items())).T
-        cnt = cnt.astype(int)
-        idx = np.argsort(cnt)[::-1]
-        name = name[idx]
-        cnt = cnt[idx]
-        return name, cnt
-
-    os_name, os_cnt = sort_count(os_count)
-    dev_name, dev_cnt = sort_count(device_count)
+def draw_item_counts(counter): # counter: ScanCounter
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    os_name, os_cnt = counter.totals("OS").index.to_numpy(), counter.totals("OS").to_numpy()
+    dev_name, dev_cnt = counter.totals("Device").index.to_numpy(), counter.totals("Device").to_numpy()
 
     plt.clf()
     fig = plt.figure(figsize=(12, 12))
@@ -186,16 +142,31 @@ def draw_item_counts(item_counts):
 
 
 if __name__ == "__main__":
-    detail_ip_path = output_dir / "detail_ip.json"
-    if detail_ip_path.exists():
-        detail_ip = json.load(open(detail_ip_path, "r"))
-    else:
-        active_ip = scan_active_ip()
-        detail_ip = scan_ip_detail(active_ip)
-        json.dump(detail_ip, open(detail_ip_path, "w"))
-    del detail_ip["202.112.39.2/32"]
-
-    draw_active_ip(detail_ip)
-
-    item_counts = item_count(detail_ip)
-    draw_item_counts(item_counts)
+    reporter = metrics.Reporter(output_dir / "metrics.json", output_dir / "metrics.prom", interval=30, prefix="tsinghua_scan")
+    try:
+        detail_ip_path = output_dir / "detail_ip.json"
+        table_path = output_dir / "detail_ip.csv"
+        active_ip_path = output_dir / "active_ip.json" # {prefix: number of hosts masscan found live}
+        if not table_path.exists() and detail_ip_path.exists():
+            print(f"{json_to_table(detail_ip_path, table_path)} hosts copied from {detail_ip_path} to {table_path}")
+        if not table_path.exists():
+            with metrics.stage("scan"):
+                tmp_path = output_dir / "detail_ip.csv.tmp" # renamed once the scan completed
+                tmp_path.unlink(missing_ok=True) # rows of a crashed scan, started over
+                writer = ScanTableWriter(tmp_path)
+                active_ip, _ = scan_pipeline(tsinghua_prefixes, n_worker=32, batch_size=64, on_detail=writer, keep_details=False)
+                writer.close()
+                json.dump({p: len(v) for p, v in active_ip.items()}, open(active_ip_path, "w"))
+                tmp_path.rename(table_path)
+
+        with metrics.stage("item_count"):
+            counter = count_table(table_path)
+            counter.drop("202.112.39.2/32")
+
+        with metrics.stage("render"):
+            # NOTE: a table converted from the old json has no masscan counts, every live host has a detail row there
+            n_active = json.load(open(active_ip_path, "r")) if active_ip_path.exists() else counter.n_host
+            draw_active_ip({p: n for p, n in n_active.items() if p != "202.112.39.2/32"})
+            draw_item_counts(counter)
+    finally: # the final metrics of a failed run as well
+        reporter.stop()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+# **********************************************************************
+# * Description   : yarrp-style stateless ttl prober, pluggable transport
+# * Last change   : 08:07:14 2026-10-18
+# * License       : www.opensource.org/licenses/bsd-license.php
+# **********************************************************************
+
+import os
+import math
+import time
+import heapq
+import random
+import select
+import socket
+import struct
+
+import metrics
+
+class IcmpTransport:
+    """
+    ICMP echo probes over a raw socket (needs root or CAP_NET_RAW), nothing
+    is kept per probe: the ttl and the send time ride in the echo id & seq,
+    which time exceeded / unreachable messages quote back together with the
+    original destination
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        self.magic = os.getpid() & 0xff # tells our probes from other echo traffic
+
+    @staticmethod
+    def _checksum(data):
+        s = sum(struct.unpack(f"!{len(data) // 2}H", data))
+        s = (s >> 16) + (s & 0xffff)
+        return ~(s + (s >> 16)) & 0xffff
+
+    def send(self, target, ttl):
+        ident, seq = self.magic << 8 | ttl, int(time.monotonic() * 1000) & 0xffff
+        header = struct.pack("!BBHHH", 8, 0, 0, ident, seq)
+        packet = struct.pack("!BBHHH", 8, 0, self._checksum(header), ident, seq)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+        self.sock.sendto(packet, (str(target), 0))
+
+    def _decode(self, data): # (hop, target, ttl, rtt) or None
+        hop, ihl = socket.inet_ntoa(data[12:16]), (data[0] & 0xf) * 4
+        kind, icmp = data[ihl], data[ihl:]
+        if kind == 0: # echo reply from the target itself
+            target, (ident, seq) = hop, struct.unpack("!HH", icmp[4:8])
+        elif kind in (3, 11) and len(icmp) >= 36: # unreachable / time exceeded quoting our probe
+            inner = icmp[8:]
+            target, inner_ihl = socket.inet_ntoa(inner[16:20]), (inner[0] & 0xf) * 4
+            if inner[9] != socket.IPPROTO_ICMP: return None
+            ident, seq = struct.unpack("!HH", inner[inner_ihl+4:inner_ihl+8])
+        else:
+            return None
+        if ident >> 8 != self.magic: return None
+        rtt = ((int(time.monotonic() * 1000) - seq) & 0xffff) / 1000
+        return hop, target, ident & 0xff, rtt
+
+    def recv(self, timeout):
+        replies = []
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        while ready:
+            try: data = self.sock.recv(65535)
+            except BlockingIOError: break
+            reply = self._decode(data)
+            if reply: replies.append(reply)
+        return replies
+
+    def close(self):
+        self.sock.close()
+
+class SimulatedTransport:
+    """
+    in-process network for tests & benchmarks: route_of(target) is the list
+    of hops towards target, None for a hop that does not answer, ttl beyond
+    the route gets the last hop again, as a reached target answers any ttl
+    """
+    def __init__(self, route_of, latency=0.0005, loss=0.0, seed=0):
+        self.route_of = route_of
+        self.latency, self.loss = latency, loss
+        self.rng = random.Random(seed)
+        self.pending = [] # heap of (arrival, hop, target, ttl, send time)
+
+    def send(self, target, ttl):
+        route = self.route_of(target)
+        hop = route[min(ttl, len(route)) - 1]
+        if hop is None or self.rng.random() < self.loss: return
+        now = time.monotonic()
+        heapq.heappush(self.pending, (now + self.latency * min(ttl, len(route)) * 2, hop, str(target), ttl, now))
+
+    def recv(self, timeout):
+        deadline = time.monotonic() + timeout
+        if self.pending and self.pending[0][0] > time.monotonic():
+            time.sleep(max(0, min(self.pending[0][0], deadline) - time.monotonic()))
+        replies, now = [], time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            arrival, hop, target, ttl, sent = heapq.heappop(self.pending)
+            replies.append((hop, target, ttl, arrival - sent))
+        return replies
+
+    def close(self):
+        pass
+
+def build_trace(target, hops, max_ttl):
+    """
+    hops: {ttl: (hop, rtt)} of one target -> the dict trace_route returns,
+    the route stops at the target or at the first ttl without answer,
+    reachable only when the target answered within max_ttl
+    """
+    route, delay, reachable = [], [], False
+    for ttl in range(1, max_ttl+1):
+        if ttl not in hops: break
+        hop, rtt = hops[ttl]
+        route.append(hop)
+        delay.append(round(rtt * 1000, 3))
+        if hop == target:
+            reachable = True
+            break
+    return {"target": target, "route": route, "delay": delay, "reachable": reachable} if route else None
+
+class YarrpProber:
+    """
+    Yarrp-style prober: every (target, ttl) probe of every target is sent
+    from one process in a random order, spreading load over paths & time,
+    at `rate` probes per second, without waiting for any answer. Replies
+    carry target & ttl, so they are matched without per-probe state and
+    routes are rebuilt once the probing is done.
+    """
+    def __init__(self, transport=None, max_ttl=16, rate=10000, timeout=2, seed=0):
+        self.transport = transport
+        self.max_ttl, self.rate, self.timeout = max_ttl, rate, timeout
+        self.seed = seed
+
+    def permutation(self, n): # i -> (a*i + b) % n with a coprime to n, random order in O(1) memory
+        rng = random.Random(self.seed)
+        a = rng.randrange(1, max(n, 2))
+        while math.gcd(a, n) != 1: a = rng.randrange(1, n)
+        b = rng.randrange(n)
+        return ((a * i + b) % n for i in range(n))
+
+    def probe(self, targets):
+        """
+        returns {target: {ttl: (hop, rtt)}}, keyed by str(target)
+        """
+        targets = [str(t) for t in targets]
+        if not targets: return {}
+        transport = self.transport or IcmpTransport()
+        hops = {t: {} for t in targets}
+        def collect(replies):
+            for hop, target, ttl, rtt in replies:
+                if target in hops and 0 < ttl <= self.max_ttl:
+                    hops[target].setdefault(ttl, (hop, rtt))
+            metrics.inc("yarrp_replies", len(replies))
+
+        start = time.monotonic()
+        for n, i in enumerate(self.permutation(len(targets) * self.max_ttl)):
+            transport.send(targets[i // self.max_ttl], i % self.max_ttl + 1)
+            ahead = (n + 1) / self.rate - (time.monotonic() - start)
+            collect(transport.recv(max(ahead, 0)))
+        metrics.inc("yarrp_probes", len(targets) * self.max_ttl)
+        while True: # drain until nothing came back for `timeout` seconds
+            replies = transport.recv(self.timeout)
+            if not replies: break
+            collect(replies)
+        if self.transport is None: transport.close()
+        return hops
+
+    def trace(self, targets): # [trace or None, ...], in the order of targets
+        hops = self.probe(targets)
+        return [build_trace(str(t), hops[str(t)], self.max_ttl) for t in targets]
+
+    def trace_targets(self, targets, on_trace=None, on_prefix_done=None, **kwargs):
+        """
+        probe_scheduler.trace_targets for the whole {prefix: [target, ...]}
+        at once, scheduler options in kwargs do not apply
+        """
+        flat = [(p, t) for p, v in targets.items() for t in v]
+        for (p, t), trace in zip(flat, self.trace([t for _, t in flat])):
+            if on_trace: on_trace(p, t, trace)
+        for p in targets:
+            if on_prefix_done: on_prefix_done(p)